@@ -51,6 +51,8 @@ intents = discord.Intents.all() bot = commands.Bot(command_prefix='!', intents=i
 # - Python 3.9+
 # - discord.py 2.x
 # - pytz
+# - optional: orjson, msgpack + zstandard (faster / smaller data file, see DATA_CODEC)
+# - optional: numpy (vectorized activity aggregation)
 #
 # Set environment variable DISCORD_TOKEN before running.
 
@@ -58,13 +60,40 @@ import discord
 from discord.ext import commands, tasks
 import asyncio
 import datetime
+import time
 import pytz
 import json
 import os
+import sys
+import collections
 import threading
 import re
+import sqlite3
+import concurrent.futures
+import heapq
+import bisect
+import gzip
+import hashlib
+import zlib
+import array
 import traceback
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set
+
+# optional, faster codecs for the data file (see DATA_CODEC)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack = zstandard = None
+# optional, vectorized activity aggregation
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # ------------------ CONFIG ------------------
 TOKEN = os.environ.get("DISCORD_TOKEN")
@@ -79,20 +108,94 @@ RMUTE_ROLE_ID = 1410423854563721287
 RCACHE_ROLES = [1410422029236047975, 1410422762895577088, 1406326282429403306]
 
 OFFLINE_DELAY = 53                     # seconds for offline threshold
-PRESENCE_CHECK_INTERVAL = 5            # how often presence tracker runs
+PRESENCE_CHECKPOINT_INTERVAL = 60      # how often open online sessions are credited (seconds)
 AUTO_SAVE_INTERVAL = 120               # autosave interval (seconds)
 DATA_FILE = "mega_bot_data.json"
+DATA_CODEC = "orjson"                  # "json" (indented), "compact", "orjson" or "msgpack+zstd"; format is auto-detected on load
 BACKUP_DIR = "mega_bot_backups"
-MAX_BACKUPS = 20
+BACKUP_INTERVAL = 900                  # seconds between backup points (independent of saves)
+BACKUP_FULL_INTERVAL = 86400           # a new full point at least this often; increments in between
+BACKUP_RETENTION = {"hourly": 24, "daily": 14, "weekly": 8}  # newest point of each of the last N periods
+BACKUP_USER_BUCKETS = 1024             # users are spread over this many backup chunks
+PERSISTENCE_MODE = "journal"           # "journal" (append-only log + snapshot), "sqlite" or "snapshot" (full rewrite)
+JOURNAL_FILE = "mega_bot_journal.jsonl"
+SQLITE_FILE = "mega_bot_data.sqlite3"
+STORE_SYNC_INTERVAL = 1                # seconds between batched journal/sqlite commits
+JOURNAL_FSYNC_BATCH = 200              # fsync early once this many records are pending
+JOURNAL_COMPACT_BYTES = 8 * 1024 * 1024  # fold the journal into the snapshot past this size
 COMMAND_COOLDOWN = 4
+ACTIVITY_RETENTION_DAYS = 120          # per-day activity older than this is pruned daily
+LEADERBOARD_DAYS = 31                  # days of activity held by the !tlb engine (covers 30d and month)
+LEADERBOARD_PAGE_SIZE = 15
+LEADERBOARD_REFRESH = 10               # seconds a changed ranking may be served from cache
+PAGE_VIEW_SIZE = 5                     # entries per !rcache / !rpurge page (keeps embeds under Discord limits)
+PAGE_VIEW_TIMEOUT = 180                # seconds before page buttons stop responding
+RMUTE_CONCURRENCY = 5                  # parallel role adds/DMs for a bulk !rmute
+MUTE_RETRY_DELAY = 60                  # seconds before a failed auto-unmute is retried
+
+# Retention for logs.* and images: (max entries, max age in days). Entries evicted by
+# either limit are spilled to gzip archives under ARCHIVE_DIR/<section>/<YYYY-MM-DD>.jsonl.gz
+LOG_RETENTION = {
+    "edits": (2000, 30),
+    "deletions": (2000, 30),
+    "member_role_changes": (1000, 90),
+    "role_update": (500, 180),
+    "channel_update": (500, 180)
+}
+LOG_RETENTION_DEFAULT = (1000, 90)     # logs not listed above
+IMAGE_RETENTION = (500, 30)            # cached deleted messages/attachments
+ARCHIVE_DIR = "mega_bot_archive"
+RETENTION_INTERVAL = 3600              # seconds between age-based retention sweeps
+
+# !rdump export
+EXPORT_CODEC = "gzip"                  # "gzip" or "zstd" (needs zstandard); can be overridden per command
+EXPORT_BATCH = 500                     # records serialized per step
+EXPORT_PART_BYTES = 8 * 1024 * 1024    # part size when the guild upload limit is unknown
+EXPORT_PART_MARGIN = 512 * 1024        # headroom under the limit for data still buffered in the compressor
+
+# Track channel publisher
+LOG_FLUSH_INTERVAL = 1.5               # seconds to gather events into one message
+LOG_RATE_LIMIT = 5                     # messages per LOG_RATE_PERIOD (channel message bucket)
+LOG_RATE_PERIOD = 5
+LOG_QUEUE_MAX = 5000                   # queued items beyond this are dropped
 
 # Audit log reconciliation lookback seconds (startup)
 AUDIT_LOOKBACK_SECONDS = 3600  # 1 hour by default; increase if you want more reconciliation
+AUDIT_PAGE_SIZE = 100                  # entries per audit log API page; the checkpoint is saved once per page
+AUDIT_SUMMARY_MAX_EMBEDS = 20          # detail embeds posted per catch-up; the rest are only counted
+
+# Audit attribution (entries pushed by on_audit_log_entry_create)
+AUDIT_CACHE_WINDOW = 300               # seconds of audit entries kept in memory
+AUDIT_ATTRIBUTION_WINDOW = 60          # an entry older than this is not attributed to a new event
+AUDIT_CORRELATION_WINDOW = 5           # seconds an event waits for its audit entry to arrive
+
+# Message content cache (serves the raw delete/edit events, replaces discord.py's message cache)
+MESSAGE_CACHE_BYTES = 32 * 1024 * 1024 # approximate memory budget for cached message content
+MESSAGE_CACHE_TTL = 3 * 86400          # seconds a message stays in the cache
+
+# Attachment archive (local copies of attachments for !rcache / purge embeds)
+ATTACHMENT_DIR = "mega_bot_attachments"
+ATTACHMENT_MAX_BYTES = 8 * 1024 * 1024 # larger attachments are not downloaded
+ATTACHMENT_QUOTA = 2 * 1024 ** 3       # disk budget; least recently used files are evicted past it
+ATTACHMENT_WORKERS = 3                 # concurrent downloads
+ATTACHMENT_QUEUE_MAX = 2000            # queued downloads beyond this are dropped
+ATTACHMENT_INDEX_MAX = 100000          # messages remembered in the attachment index
+
+# Ingestion pipeline (per-message activity updates)
+INGEST_BATCH_INTERVAL = 0.25           # seconds between batches
+INGEST_BATCH_SIZE = 500                # events that trigger a batch immediately / max per batch
+INGEST_QUEUE_MAX = 50000               # queued events beyond this are dropped
+INGEST_RATE_WINDOW = 60                # seconds averaged for the events/sec figure in !rstats
+
+# Startup
+LAZY_MEMBER_CHUNKING = True            # don't download every member on connect; load tracked members by id instead
+MEMBER_QUERY_BATCH = 100               # ids per query_members request (gateway maximum)
 
 # ------------------ INTENTS & BOT ------------------
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
-data_lock = threading.Lock()
+bot = commands.Bot(command_prefix="!", intents=intents, max_messages=None,  # MessageCache keeps what we need
+                   chunk_guilds_at_startup=not LAZY_MEMBER_CHUNKING)
+data_lock = asyncio.Lock()         # guards writes of the resident store
 console_lock = threading.Lock()
 command_cooldowns: Dict[int, float] = {}
 
@@ -101,23 +204,165 @@ def safe_print(*args, **kwargs):
     with console_lock:
         print(*args, **kwargs)
 
+# ------------------ DISK WRITER ------------------
+class DiskWriter:
+    """
+    One background thread that performs every persistence write (snapshot, backups,
+    journal, archive), in submission order, so the event loop never blocks on file I/O.
+    `submit()` returns a future that completes once that write is on disk; from a
+    coroutine use `await disk_writer.run(...)`.
+    """
+
+    def __init__(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-writer")
+
+    def submit(self, fn, *args) -> concurrent.futures.Future:
+        return self.executor.submit(fn, *args)
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def barrier(self) -> concurrent.futures.Future:
+        """Future that completes after everything queued so far."""
+        return self.submit(lambda: None)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+disk_writer = DiskWriter()
+
+def write_atomic(path: str, payload: bytes) -> None:
+    """Write to a temp file next to `path`, fsync, then rename over it."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
 # ------------------ PERSISTENCE ------------------
 def init_data_structure() -> Dict[str, Any]:
     return {
         "users": {},
-        "mutes": {},                 # keyed by mute_id
+        "activity": {},              # user_id -> ActivityRow (seconds online per UTC day)
+        "mutes": {},                 # keyed by user_id -> {"active": [...], "history": [...]}
         "images": {},                # cached deleted attachments/messages
         "logs": {},                  # various logs
         "rmute_usage": {},           # moderator usage counts
+        "rmute_activity": {},        # moderator id -> ActivityRow of mutes issued per UTC day
+        "activity_months": {},       # user_id -> {"YYYY-MM": seconds} kept read-only from the old monthly_seconds
         "last_audit_check": None,    # ISO timestamp of last audit reconciliation
-        "rping_disabled_users": {}   # mapping user_id -> bool (True means disabled)
+        "audit_checkpoint": None,    # id of the last audit log entry handled (catch-up resumes after it)
+        "tracked_members": [],       # TRACK_ROLES holders at last run, restored before members are loaded
+        "rping_disabled_users": {},  # mapping user_id -> bool (True means disabled)
+        "journal_seq": 0             # last journal record folded into this snapshot
     }
 
+# ------------------ DATA CODECS ------------------
+# How DATA_FILE is encoded. load_data() detects the format from the bytes, so DATA_CODEC
+# can be changed at any time; the next save rewrites the file in the new format.
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def json_default(o: Any) -> Any:
+    # resident logs are deques (see RetentionPolicy), activity rows are arrays; anything else is stringified
+    if isinstance(o, collections.deque):
+        return list(o)
+    if isinstance(o, ActivityRow):
+        return o.to_json()
+    return str(o)
+
+def _encode_json(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, indent=2, default=json_default).encode("utf-8")
+
+def _encode_compact(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, separators=(",", ":"), default=json_default).encode("utf-8")
+
+def _encode_orjson(data: Dict[str, Any]) -> bytes:
+    return orjson.dumps(data, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+def _encode_msgpack_zstd(data: Dict[str, Any]) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(msgpack.packb(data, default=json_default))
+
+DATA_CODECS = {
+    "json": (_encode_json, lambda: True),
+    "compact": (_encode_compact, lambda: True),
+    "orjson": (_encode_orjson, lambda: orjson is not None),
+    "msgpack+zstd": (_encode_msgpack_zstd, lambda: msgpack is not None and zstandard is not None)
+}
+
+codec_warnings: Set[str] = set()
+
+def resolve_codec(name: Optional[str] = None) -> str:
+    name = name or DATA_CODEC
+    if name in DATA_CODECS and DATA_CODECS[name][1]():
+        return name
+    if name not in codec_warnings:
+        codec_warnings.add(name)
+        safe_print(f"⚠️ DATA_CODEC {name!r} is unknown or its library is not installed; using compact JSON.")
+    return "compact"
+
+def encode_data(data: Dict[str, Any], codec: Optional[str] = None) -> bytes:
+    return DATA_CODECS[resolve_codec(codec)][0](data)
+
+def decode_data(payload: bytes) -> Dict[str, Any]:
+    if payload[:4] == ZSTD_MAGIC:
+        if msgpack is None or zstandard is None:
+            raise RuntimeError("data file is msgpack+zstd but msgpack/zstandard are not installed")
+        return msgpack.unpackb(zstandard.ZstdDecompressor().decompress(payload), raw=False, strict_map_key=False)
+    # every JSON flavour (indented, compact, orjson) reads back the same way
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+def synthetic_document(n_users: int) -> Dict[str, Any]:
+    """A data document shaped like production, for benchmarking codecs."""
+    doc = init_data_structure()
+    today = datetime.date(2026, 1, 1)
+    first = day_number(today) - 29
+    for i in range(n_users):
+        uid = str(1000000000000000000 + i * 7919)
+        daily = [(i * 37 + d * 1031) % 86400 for d in range(30)]
+        doc["activity"][uid] = ActivityRow(first, daily)
+        doc["users"][uid] = {
+            "status": "offline",
+            "online_time": "2026-01-01 10:00:00",
+            "offline_time": "2026-01-01 12:30:00",
+            "last_message": f"message number {i} from a synthetic user",
+            "last_message_time": "2026-01-01 12:29:41",
+            "last_edit": None,
+            "last_edit_time": None,
+            "last_delete": None,
+            "last_online_times": {},
+            "online_since": None,
+            "total_online_seconds": sum(daily),
+            "notify": True
+        }
+    return doc
+
+def bench_codecs(n_users: int = 100_000) -> None:
+    """python main.py --bench-codecs [users]: save/load time and size of DATA_FILE per codec."""
+    import tempfile
+    safe_print(f"Building synthetic data for {n_users} users...")
+    doc = synthetic_document(n_users)
+    safe_print(f"{'codec':<14}{'save s':>9}{'load s':>9}{'size MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data")
+        for name, (encode, available) in DATA_CODECS.items():
+            if not available():
+                safe_print(f"{name:<14}{'(library not installed)':>28}")
+                continue
+            t0 = time.perf_counter()
+            write_atomic(path, encode(doc))
+            t1 = time.perf_counter()
+            with open(path, "rb") as f:
+                loaded = decode_data(f.read())
+            t2 = time.perf_counter()
+            assert len(loaded["users"]) == n_users
+            safe_print(f"{name:<14}{t1 - t0:>9.2f}{t2 - t1:>9.2f}{os.path.getsize(path) / 1e6:>10.1f}")
+
 def load_data() -> Dict[str, Any]:
     if os.path.exists(DATA_FILE):
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(DATA_FILE, "rb") as f:
+                return decode_data(f.read())
         except Exception as e:
             safe_print("⚠️ Failed to load data file:", e)
             try:
@@ -128,34 +373,1382 @@ def load_data() -> Dict[str, Any]:
     else:
         return init_data_structure()
 
-def rotate_backups():
+# codecs whose encoder is C end to end: encoding the resident data on the loop costs less
+# than copying it in Python (100k users: orjson 0.3s, msgpack+zstd 0.5s, copy 0.6s, compact JSON 1.3s)
+LOOP_ENCODED_CODECS = {"orjson", "msgpack+zstd"}
+LEAF_TYPES = frozenset((str, int, float, bool, type(None)))
+
+def copy_document(node: Any) -> Any:
+    """Private copy of a document for the disk writer: containers are copied, leaves are shared."""
+    kind = type(node)
+    if kind is dict:
+        out = node.copy()
+        for k, v in node.items():
+            if type(v) not in LEAF_TYPES:
+                out[k] = copy_document(v)
+        return out
+    if kind is list or kind is collections.deque:
+        return [v if type(v) in LEAF_TYPES else copy_document(v) for v in node]
+    if kind is ActivityRow:
+        return node.copy()
+    return node
+
+def serialize_data(data: Dict[str, Any]) -> bytes:
+    # call on the thread that owns `data`; for the resident store that is the event loop
+    return encode_data(data)
+
+def write_data(payload: bytes) -> bool:
+    """Atomically rewrite DATA_FILE with an encoded document. Call on the disk writer thread."""
     try:
-        os.makedirs(BACKUP_DIR, exist_ok=True)
-        files = sorted(os.listdir(BACKUP_DIR))
-        while len(files) > MAX_BACKUPS:
-            os.remove(os.path.join(BACKUP_DIR, files.pop(0)))
+        write_atomic(DATA_FILE, payload)
+        return True
     except Exception as e:
-        safe_print("⚠️ backup rotation error:", e)
+        safe_print("❌ Error saving data:", e)
+        traceback.print_exc()
+        return False
 
-def save_data(data: Dict[str, Any]):
-    with data_lock:
-        try:
-            os.makedirs(BACKUP_DIR, exist_ok=True)
-            ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            backup = os.path.join(BACKUP_DIR, f"backup_{ts}.json")
-            with open(backup, "w", encoding="utf-8") as bf:
-                json.dump(data, bf, indent=2, default=str)
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, default=str)
-            rotate_backups()
-        except Exception as e:
-            safe_print("❌ Error saving data:", e)
-            traceback.print_exc()
+def save_data(data: Dict[str, Any]) -> bool:
+    """
+    Encode and write a document nothing else is mutating: a copy_document() copy, one the
+    disk writer built itself, or the resident data while the loop is blocked on the result. Backups are separate (BackupStore).
+    """
+    try:
+        payload = serialize_data(data)
+    except Exception as e:
+        safe_print("❌ Error saving data:", e)
+        traceback.print_exc()
+        return False
+    return write_data(payload)
+
+# ------------------ BACKUPS ------------------
+class BackupStore:
+    """
+    Point-in-time backups, taken on their own schedule (backup_task) rather than on save.
+
+      objects/<ab>/<sha256>           content-addressed chunk, stored once however many points use it
+      points/<YYYYmmdd_HHMMSS>.json   manifest: chunk name -> object hash
+
+    The document is split into chunks (one per top-level section; users and activity are
+    spread over BACKUP_USER_BUCKETS buckets). A full point lists every chunk; an increment lists only
+    the chunks that differ from its base full, and those objects are zlib-compressed with
+    the base version as preset dictionary, so they store little more than the change.
+    All methods do blocking file I/O: run them on the disk writer (or offline).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.points_dir = os.path.join(root, "points")
+
+    # --- chunks / objects ---
+    @staticmethod
+    def chunk_document(doc: Dict[str, Any]) -> Dict[str, bytes]:
+        chunks: Dict[str, Any] = {}
+        for key, value in doc.items():
+            if key in ("users", "activity"):
+                for uid, u in value.items():
+                    bucket = zlib.crc32(uid.encode("utf-8")) % BACKUP_USER_BUCKETS
+                    chunks.setdefault(f"{key}/{bucket:04d}", {})[uid] = u
+            else:
+                chunks[key] = value
+        return {name: json.dumps(v, sort_keys=True, separators=(",", ":"), default=json_default).encode("utf-8")
+                for name, v in chunks.items()}
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def _put(self, raw: bytes, base: Optional[bytes] = None, base_digest: Optional[str] = None) -> str:
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            if base is not None:
+                comp = zlib.compressobj(9, zdict=base[-32768:])
+                payload = b"D" + base_digest.encode("ascii") + comp.compress(raw) + comp.flush()
+            else:
+                payload = b"F" + zlib.compress(raw, 9)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, payload)
+        return digest
+
+    def _get(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as f:
+            payload = f.read()
+        if payload[:1] == b"D":
+            base = self._get(payload[1:65].decode("ascii"))
+            decomp = zlib.decompressobj(zdict=base[-32768:])
+            return decomp.decompress(payload[65:]) + decomp.flush()
+        return zlib.decompress(payload[1:])
+
+    def _object_base(self, digest: str) -> Optional[str]:
+        with open(self._object_path(digest), "rb") as f:
+            head = f.read(65)
+        return head[1:65].decode("ascii") if head[:1] == b"D" else None
+
+    # --- points ---
+    def points(self) -> List[str]:
+        if not os.path.isdir(self.points_dir):
+            return []
+        return sorted(n[:-5] for n in os.listdir(self.points_dir) if n.endswith(".json"))
+
+    def manifest(self, name: str) -> Dict[str, Any]:
+        with open(os.path.join(self.points_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def take(self, doc: Dict[str, Any], now: Optional[datetime.datetime] = None) -> str:
+        """Write a new point for `doc` (full or increment) and apply retention. Returns its name."""
+        now = now or datetime.datetime.utcnow()
+        name = now.strftime("%Y%m%d_%H%M%S")
+        chunks = self.chunk_document(doc)
+        fulls = [n for n in self.points() if self.manifest(n).get("full")]
+        base = self.manifest(fulls[-1]) if fulls else None
+        if base is None or (now - datetime.datetime.strptime(fulls[-1], "%Y%m%d_%H%M%S")).total_seconds() >= BACKUP_FULL_INTERVAL:
+            manifest = {"full": True, "time": now.isoformat(), "chunks": {c: self._put(raw) for c, raw in chunks.items()}}
+        else:
+            changed = {}
+            for c, raw in chunks.items():
+                base_digest = base["chunks"].get(c)
+                if base_digest == hashlib.sha256(raw).hexdigest():
+                    continue
+                changed[c] = self._put(raw, self._get(base_digest), base_digest) if base_digest else self._put(raw)
+            manifest = {"full": False, "base": fulls[-1], "time": now.isoformat(), "chunks": changed,
+                        "removed": sorted(set(base["chunks"]) - set(chunks))}
+        os.makedirs(self.points_dir, exist_ok=True)
+        write_atomic(os.path.join(self.points_dir, f"{name}.json"), json.dumps(manifest).encode("utf-8"))
+        self.prune(now)
+        return name
+
+    def restore(self, name: str) -> Dict[str, Any]:
+        """Rebuild the document as it was at point `name`."""
+        m = self.manifest(name)
+        chunks = dict(self.manifest(m["base"])["chunks"]) if not m.get("full") else {}
+        chunks.update(m["chunks"])
+        for c in m.get("removed", []):
+            chunks.pop(c, None)
+        doc: Dict[str, Any] = {"users": {}}
+        for c, digest in chunks.items():
+            value = json.loads(self._get(digest))
+            if "/" in c:
+                # a bucket of a per-user section
+                doc.setdefault(c.split("/")[0], {}).update(value)
+            else:
+                doc[c] = value
+        return doc
+
+    def resolve(self, point: str) -> Optional[str]:
+        """`latest`, or the newest point at/before a YYYYmmdd[_HHMMSS] prefix."""
+        names = self.points()
+        if point == "latest":
+            return names[-1] if names else None
+        older = [n for n in names if n <= point + "~"]
+        return older[-1] if older else None
+
+    # --- retention ---
+    def prune(self, now: datetime.datetime) -> None:
+        """Keep the newest point of each of the last N hours/days/weeks (BACKUP_RETENTION)."""
+        names = self.points()
+        stamps = sorted(((datetime.datetime.strptime(n, "%Y%m%d_%H%M%S"), n) for n in names), reverse=True)
+        keep = set(names[-1:])
+        for tier, fmt in (("hourly", "%Y%m%d%H"), ("daily", "%Y%m%d"), ("weekly", "%G%V")):
+            periods: Set[str] = set()
+            for ts, n in stamps:
+                period = ts.strftime(fmt)
+                if period in periods:
+                    continue
+                if len(periods) >= BACKUP_RETENTION.get(tier, 0):
+                    break
+                periods.add(period)
+                keep.add(n)
+        manifests = {n: self.manifest(n) for n in keep}
+        for m in list(manifests.values()):
+            # an increment is useless without its base full
+            if not m.get("full") and m["base"] not in manifests:
+                manifests[m["base"]] = self.manifest(m["base"])
+        for n in names:
+            if n not in manifests:
+                os.remove(os.path.join(self.points_dir, f"{n}.json"))
+        live: Set[str] = set()
+        pending = [d for m in manifests.values() for d in m["chunks"].values()]
+        while pending:
+            digest = pending.pop()
+            if digest not in live:
+                live.add(digest)
+                base = self._object_base(digest)
+                if base:
+                    pending.append(base)
+        if not os.path.isdir(self.objects):
+            return
+        for sub in os.listdir(self.objects):
+            folder = os.path.join(self.objects, sub)
+            for digest in os.listdir(folder):
+                if digest not in live and not digest.endswith(".tmp"):
+                    os.remove(os.path.join(folder, digest))
+
+backups = BackupStore(BACKUP_DIR)
+
+def restore_backup(point: str) -> None:
+    """Offline: replace the live data with a kept backup point. The current files are kept as *.pre-restore."""
+    name = backups.resolve(point)
+    if name is None:
+        safe_print(f"❌ No backup point matches {point!r}. Use --list-backups.")
+        return
+    doc = backups.restore(name)
+    doc["journal_seq"] = 0
+    live = [SQLITE_FILE, SQLITE_FILE + "-wal", SQLITE_FILE + "-shm"] if PERSISTENCE_MODE == "sqlite" else [DATA_FILE, JOURNAL_FILE]
+    for path in live:
+        if os.path.exists(path):
+            os.replace(path, path + ".pre-restore")
+    if PERSISTENCE_MODE == "sqlite":
+        backend = SqliteBackend(SQLITE_FILE)
+        backend.import_document(doc)
+        backend.close(doc, False)
+    else:
+        write_atomic(DATA_FILE, serialize_data(doc))
+    safe_print(f"✅ Restored backup point {name} ({len(doc.get('users', {}))} users).")
+
+def list_backups() -> None:
+    for name in backups.points():
+        m = backups.manifest(name)
+        kind = "full" if m.get("full") else f"increment of {m['base']}"
+        safe_print(f"{name}  {kind}  ({len(m['chunks'])} chunks)")
+
+# ------------------ ACTIVITY COLUMNS ------------------
+# Online seconds per UTC day live in data["activity"][uid] as an ActivityRow: one
+# array('I') indexed by day number (days since 1970-01-01), instead of per-user dicts
+# keyed by formatted strings. Weekly/monthly/average figures are derived on read.
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+ZERO_DAY = array.array("I", [0])
+
+def day_number(when) -> int:
+    return when.toordinal() - EPOCH_ORDINAL
+
+def day_key(day: int) -> str:
+    return datetime.date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+def parse_day_key(key: str) -> int:
+    return day_number(datetime.date.fromisoformat(key))
+
+class ActivityRow:
+    """Seconds online per day for one user; seconds[i] belongs to day number start + i."""
+    __slots__ = ("start", "seconds")
+
+    def __init__(self, start: int = 0, seconds=()):
+        self.start = start
+        self.seconds = array.array("I", seconds)
+
+    @classmethod
+    def from_json(cls, doc: Any) -> "ActivityRow":
+        if isinstance(doc, ActivityRow):
+            return doc
+        if not doc:
+            return cls()
+        return cls(doc.get("start", 0), doc.get("seconds", ()))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"start": self.start, "seconds": self.seconds.tolist()}
+
+    def add(self, day: int, amount: int) -> None:
+        if not self.seconds:
+            self.start = day
+        elif day < self.start:
+            self.seconds[0:0] = ZERO_DAY * (self.start - day)
+            self.start = day
+        i = day - self.start
+        if i >= len(self.seconds):
+            self.seconds.extend(ZERO_DAY * (i + 1 - len(self.seconds)))
+        self.seconds[i] += amount
+
+    def get(self, day: int) -> int:
+        i = day - self.start
+        return self.seconds[i] if 0 <= i < len(self.seconds) else 0
+
+    def items(self):
+        """(day number, seconds) for every day with activity."""
+        return ((self.start + i, s) for i, s in enumerate(self.seconds) if s)
+
+    def view(self):
+        """The row as a numpy uint32 array sharing memory with `seconds` (numpy required)."""
+        return numpy.frombuffer(self.seconds, dtype=numpy.uint32) if self.seconds else numpy.zeros(0, dtype=numpy.uint32)
+
+    def sum_range(self, first: int, last: int) -> int:
+        """Total seconds for days first..last inclusive."""
+        a = max(first - self.start, 0)
+        b = min(last - self.start + 1, len(self.seconds))
+        if a >= b:
+            return 0
+        if numpy is not None:
+            return int(self.view()[a:b].sum(dtype=numpy.uint64))
+        return sum(self.seconds[a:b])
+
+    def active_days(self) -> int:
+        if numpy is not None:
+            return int(numpy.count_nonzero(self.view()))
+        return sum(1 for s in self.seconds if s)
+
+    def copy(self) -> "ActivityRow":
+        row = ActivityRow.__new__(ActivityRow)
+        row.start, row.seconds = self.start, self.seconds[:]
+        return row
+
+    def trimmed(self, first: int) -> "ActivityRow":
+        """Copy without the days before `first`."""
+        if first <= self.start:
+            return ActivityRow(self.start, self.seconds)
+        return ActivityRow(first, self.seconds[first - self.start:])
+
+def activity_summary(uid: str, now: Optional[datetime.datetime] = None) -> Dict[str, int]:
+    """today / week (Sunday start) / month totals and the average over active days."""
+    now = now or datetime.datetime.utcnow()
+    today = day_number(now)
+    row = store.data["activity"].get(uid) or ActivityRow()
+    week_start = today - (today + 4) % 7    # day 0 (1970-01-01) was a Thursday
+    month_start = day_number(now.replace(day=1))
+    total = store.data["users"].get(uid, {}).get("total_online_seconds", 0)
+    return {
+        "today": row.get(today),
+        "week": row.sum_range(week_start, today),
+        "month": row.sum_range(month_start, today),
+        "average": total // max(row.active_days(), 1)
+    }
+
+def normalize_activity(doc: Dict[str, Any]) -> bool:
+    """
+    Make every doc["activity"] / doc["rmute_activity"] value an ActivityRow and fold the old per-user
+    daily_seconds dicts into them. Old monthly_seconds totals move to doc["activity_months"]
+    as-is, since daily history older than ACTIVITY_RETENTION_DAYS was already pruned;
+    weekly_seconds and average_online are dropped (derived now). Adds rather than
+    overwrites, so it is safe to run on every load. Returns True when old-layout fields were found.
+    """
+    for section in ("activity", "rmute_activity"):
+        rows = doc.setdefault(section, {})
+        for uid in list(rows):
+            rows[uid] = ActivityRow.from_json(rows[uid])
+    activity = doc["activity"]
+    months = doc.setdefault("activity_months", {})
+    converted = False
+    for uid, u in doc.get("users", {}).items():
+        for key in ("daily_seconds", "weekly_seconds", "monthly_seconds", "average_online"):
+            if key not in u:
+                continue
+            converted = True
+            value = u.pop(key)
+            if key == "daily_seconds" and value:
+                row = activity.setdefault(uid, ActivityRow())
+                for k, sec in value.items():
+                    try:
+                        row.add(parse_day_key(k), int(sec))
+                    except ValueError:
+                        pass
+            elif key == "monthly_seconds" and value:
+                months.setdefault(uid, {}).update(value)
+    return converted
+
+# ------------------ MUTATION OPS ------------------
+# Every change to the store is expressed as an op: [kind, path, value].
+#   set    -> node[path] = value
+#   update -> node[path].update(value)
+#   append -> node[path].append(value)
+#   incr   -> node[path] += value
+#   del    -> node.pop(path)
+#   trim   -> drop the value oldest entries of the list/deque at path (retention evictions)
+#   tally  -> node[path].add(day, seconds) on an ActivityRow; value is [day, seconds]
+def apply_op(data: Dict[str, Any], op: List[Any]) -> None:
+    kind, path, value = op
+    node = data
+    for key in path[:-1]:
+        node = node.setdefault(key, {})
+    last = path[-1]
+    if kind == "set":
+        node[last] = value
+    elif kind == "update":
+        node.setdefault(last, {}).update(value)
+    elif kind == "append":
+        node.setdefault(last, []).append(value)
+    elif kind == "incr":
+        node[last] = node.get(last, 0) + value
+    elif kind == "del":
+        node.pop(last, None)
+    elif kind == "trim":
+        buf = node.get(last)
+        if isinstance(buf, collections.deque):
+            for _ in range(min(value, len(buf))):
+                buf.popleft()
+        elif buf:
+            del buf[:value]
+    elif kind == "tally":
+        row = node.get(last)
+        if not isinstance(row, ActivityRow):
+            # replaying onto a freshly decoded document
+            row = node[last] = ActivityRow.from_json(row)
+        row.add(*value)
+    else:
+        raise ValueError(f"unknown op {kind!r}")
+
+# ------------------ WRITE-AHEAD JOURNAL ------------------
+def replay_journal(path: str, data: Dict[str, Any], after_seq: int, upto: Optional[int] = None) -> tuple:
+    """Apply records with after_seq < seq <= upto from the journal file. Returns (applied, last seq)."""
+    applied, last = 0, after_seq
+    if not os.path.exists(path):
+        return applied, last
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # torn write from a crash; everything after it is unusable
+                safe_print("⚠️ journal: stopping replay at unreadable record")
+                break
+            if rec["seq"] <= last:
+                continue
+            if upto is not None and rec["seq"] > upto:
+                break
+            for op in rec["ops"]:
+                apply_op(data, op)
+            last = rec["seq"]
+            applied += 1
+    return applied, last
+
+class Journal:
+    """
+    Append-only JSON-lines log of mutation records. Records are buffered in memory and
+    handed to the disk writer in batches (written + fsynced there); compaction folds them
+    into the snapshot file and drops them from the log. Each record carries a sequence
+    number so records already folded into a snapshot are skipped on replay.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.seq = 0
+        self.pending: List[str] = []
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def append(self, ops: List[List[Any]]) -> None:
+        self.seq += 1
+        self.pending.append(json.dumps({"seq": self.seq, "ops": ops}, separators=(",", ":"), default=json_default))
+        if len(self.pending) >= JOURNAL_FSYNC_BATCH:
+            self.sync()
+
+    def sync(self) -> concurrent.futures.Future:
+        """Queue pending records for writing; the future completes once they are fsynced."""
+        if not self.pending:
+            return disk_writer.barrier()
+        chunk = ("\n".join(self.pending) + "\n").encode("utf-8")
+        self.pending = []
+        return disk_writer.submit(self._write, chunk)
+
+    def _write(self, chunk: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        self.size += len(chunk)
+
+    def replay(self, data: Dict[str, Any]) -> int:
+        """Apply records newer than the snapshot's journal_seq. Returns how many were applied."""
+        applied, self.seq = replay_journal(self.path, data, data.get("journal_seq", 0) or 0)
+        return applied
+
+    def drop_through(self, seq: int) -> None:
+        """Disk writer only: remove records with seq <= `seq` (now part of the snapshot)."""
+        keep = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        if json.loads(line)["seq"] > seq:
+                            keep.append(line)
+                    except ValueError:
+                        break
+        payload = "".join(keep).encode("utf-8")
+        write_atomic(self.path, payload)
+        self.size = len(payload)
+
+# ------------------ STORAGE BACKENDS ------------------
+class StorageBackend:
+    """
+    Persistence strategy behind DataStore. A backend sees every op batch through `record()`
+    and decides how it reaches disk; it also answers the queries commands need over the big
+    collections (logs, images). The base class answers them from the resident document.
+    """
+    incremental = False          # True when cheap enough to sync every STORE_SYNC_INTERVAL
+
+    def load(self) -> Dict[str, Any]:
+        return load_data()
+
+    def resident(self, path: List[str]) -> bool:
+        """Whether ops on `path` are applied to the in-memory document."""
+        return True
+
+    def record(self, ops: List[List[Any]]) -> None:
+        pass
+
+    async def sync(self, data: Dict[str, Any]) -> None:
+        # handlers may mutate `data` while the writer is busy, so it only ever gets bytes or a copy
+        if resolve_codec() in LOOP_ENCODED_CODECS:
+            await disk_writer.run(write_data, serialize_data(data))
+        else:
+            await disk_writer.run(save_data, copy_document(data))
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    async def compact(self, data: Dict[str, Any]) -> None:
+        pass
+
+    async def enforce_retention(self, data: Dict[str, Any], policy: "RetentionPolicy") -> int:
+        """Age sweep of the resident logs/images; count limits are enforced as entries arrive."""
+        return policy.expire(data)
+
+    async def backup_document(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """A private, consistent copy of the persisted state (called right after a flush)."""
+        return await disk_writer.run(load_data)
+
+    def close(self, data: Dict[str, Any], dirty: bool) -> None:
+        if dirty:
+            disk_writer.submit(save_data, data).result()
+
+    # --- queries ---
+    async def page_images(self, data: Dict[str, Any], filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        """(total matching, [(message_id, info), ...]) newest first."""
+        images = data.get("images", {})
+        return page_newest_first(((mid, images[mid]) for mid in reversed(images)), lambda kv: kv[1], filters, offset, limit)
+
+    async def page_log(self, data: Dict[str, Any], kind: str, filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        """(total matching, [entry, ...]) newest first."""
+        return page_newest_first(reversed(data.get("logs", {}).get(kind, ())), lambda e: e, filters, offset, limit)
+
+    async def export_batches(self, data: Dict[str, Any], section: str, window: Optional[tuple]):
+        """Async iterator over lists of up to EXPORT_BATCH (key, value) records of `section`."""
+        batch = []
+        for record in resident_export_records(data, section, window):
+            batch.append(record)
+            if len(batch) >= EXPORT_BATCH:
+                yield batch
+                batch = []
+                await asyncio.sleep(0)
+        if batch:
+            yield batch
+
+def entry_matches(entry: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    if filters.get("author") is not None and entry.get("author") != filters["author"]:
+        return False
+    if filters.get("channel") is not None and entry.get("channel") != filters["channel"]:
+        return False
+    if filters.get("bulk") is not None and bool(entry.get("bulk") or entry.get("bulk_deleted")) != filters["bulk"]:
+        return False
+    return True
+
+def page_newest_first(items, entry_of, filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+    # resident logs/images are bounded by retention and already in time order
+    total, page = 0, []
+    for item in items:
+        if entry_matches(entry_of(item), filters):
+            if offset <= total < offset + limit:
+                page.append(item)
+            total += 1
+    return total, page
+
+class SnapshotBackend(StorageBackend):
+    """Original behaviour: every sync rewrites the whole JSON file."""
+
+class JournalBackend(StorageBackend):
+    """JSON snapshot plus an append-only journal of op records; see Journal."""
+    incremental = True
+
+    def __init__(self, path: str):
+        self.journal = Journal(path)
+
+    def load(self) -> Dict[str, Any]:
+        data = load_data()
+        replayed = self.journal.replay(data)
+        if replayed:
+            safe_print(f"📜 Replayed {replayed} journal records.")
+            # nothing else touches `data` yet, so it can be written as-is
+            disk_writer.submit(self._write_snapshot, data, self.journal.seq).result()
+        return data
+
+    def record(self, ops: List[List[Any]]) -> None:
+        self.journal.append(ops)
+
+    async def sync(self, data: Dict[str, Any]) -> None:
+        await asyncio.wrap_future(self.journal.sync())
+
+    def needs_compaction(self) -> bool:
+        return self.journal.size >= JOURNAL_COMPACT_BYTES
+
+    async def compact(self, data: Dict[str, Any]) -> None:
+        # handlers keep mutating the resident document, so the writer folds the journal
+        # into its own copy read back from disk instead of serializing `data`
+        self.journal.sync()
+        await disk_writer.run(self._fold_from_disk, self.journal.seq)
+
+    async def backup_document(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self.journal.sync()
+        return await disk_writer.run(self._document_from_disk, self.journal.seq)
+
+    def close(self, data: Dict[str, Any], dirty: bool) -> None:
+        if dirty or self.journal.size or self.journal.pending:
+            self.journal.sync()
+            disk_writer.submit(self._write_snapshot, data, self.journal.seq).result()
+
+    def _write_snapshot(self, data: Dict[str, Any], seq: int) -> None:
+        """Disk writer only: save a snapshot that includes records <= seq, then drop them from the journal."""
+        data["journal_seq"] = seq
+        if save_data(data):
+            self.journal.drop_through(seq)
+
+    def _document_from_disk(self, seq: int) -> Dict[str, Any]:
+        """Disk writer only: the snapshot file with journal records <= seq replayed onto it."""
+        doc = load_data()
+        replay_journal(self.journal.path, doc, doc.get("journal_seq", 0) or 0, seq)
+        normalize_activity(doc)
+        # no retention pass here: the live store journals its own evictions as trim ops,
+        # which only line up with the entries they name if the snapshot is trimmed by them alone
+        return doc
+
+    def _fold_from_disk(self, seq: int) -> None:
+        self._write_snapshot(self._document_from_disk(seq), seq)
+
+# ------------------ SQLITE BACKEND ------------------
+# Log tables share one layout; `subject` is the id the log is about (author, member, role...).
+LOG_SUBJECT_FIELDS = {
+    "edits": "author",
+    "deletions": "author",
+    "member_role_changes": "member",
+    "role_update": "role_id",
+    "channel_update": "channel_id"
+}
+MESSAGE_INSERT = "INSERT OR REPLACE INTO messages (message_id, author, time, bulk, doc, channel) VALUES (?, ?, ?, ?, ?, ?)"
+
+def log_insert(kind: str) -> str:
+    return f"INSERT INTO log_{kind} (time, subject, doc, channel, bulk) VALUES (?, ?, ?, ?, ?)"
+
+# Sections that live only in SQLite; everything else stays resident in memory.
+SQLITE_ONLY_SECTIONS = ("logs", "images")
+
+class SqliteBackend(StorageBackend):
+    """
+    Stores users, per-day activity, mutes, cached messages and each log type in indexed
+    tables (WAL mode). Logs and cached messages are not kept in memory at all; commands
+    read them with indexed queries. All database work runs on one dedicated thread so the
+    event loop never blocks on SQLite.
+    """
+    incremental = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn: Optional[sqlite3.Connection] = None
+        self.dirty_users: Set[str] = set()
+        self.dirty_days: Set[tuple] = set()
+        self.dirty_mutes: Set[str] = set()
+        self.all_mutes_dirty = False
+        self.dirty_kv: Set[str] = set()
+        self.rows: List[tuple] = []      # (sql, params) captured at record time
+
+    # --- connection / schema (sqlite thread or before the loop starts) ---
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema(self.conn)
+        return self.conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (uid TEXT PRIMARY KEY, total_online_seconds INTEGER NOT NULL DEFAULT 0, doc TEXT NOT NULL);
+            DROP INDEX IF EXISTS users_total;
+            CREATE TABLE IF NOT EXISTS user_days (uid TEXT NOT NULL, day TEXT NOT NULL, seconds INTEGER NOT NULL, PRIMARY KEY (uid, day));
+            CREATE INDEX IF NOT EXISTS user_days_day ON user_days(day);
+            CREATE TABLE IF NOT EXISTS user_mutes (user_id TEXT PRIMARY KEY, active INTEGER NOT NULL DEFAULT 0, doc TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS user_mutes_active ON user_mutes(active);
+            CREATE TABLE IF NOT EXISTS messages (message_id TEXT PRIMARY KEY, author INTEGER, time TEXT, bulk INTEGER NOT NULL DEFAULT 0, doc TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS messages_time ON messages(time);
+            CREATE INDEX IF NOT EXISTS messages_author ON messages(author);
+            CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        for kind in LOG_SUBJECT_FIELDS:
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS log_{kind} (id INTEGER PRIMARY KEY AUTOINCREMENT, time TEXT, subject INTEGER, doc TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS log_{kind}_time ON log_{kind}(time);
+                CREATE INDEX IF NOT EXISTS log_{kind}_subject ON log_{kind}(subject);
+            """)
+        # channel/bulk columns for the !rcache / !rpurge filters (added to older databases too)
+        for table in ["messages"] + [f"log_{kind}" for kind in LOG_SUBJECT_FIELDS]:
+            cols = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if "channel" not in cols:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN channel INTEGER")
+            if "bulk" not in cols:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN bulk INTEGER NOT NULL DEFAULT 0")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_channel ON {table}(channel)")
+        conn.commit()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # --- load / migrate ---
+    def load(self) -> Dict[str, Any]:
+        fresh = not os.path.exists(self.path)
+        conn = self._connect()
+        if fresh and os.path.exists(DATA_FILE):
+            safe_print(f"🛠️ Migrating {DATA_FILE} into {self.path}...")
+            self.import_document(load_data())
+        data = self._read_resident(conn)
+        self._migrate_legacy_mutes(conn, data)
+        return data
+
+    @staticmethod
+    def _read_resident(conn: sqlite3.Connection) -> Dict[str, Any]:
+        data = init_data_structure()
+        for key, value in conn.execute("SELECT key, value FROM kv"):
+            data[key] = json.loads(value)
+        for uid, doc in conn.execute("SELECT uid, doc FROM users"):
+            data["users"][uid] = json.loads(doc)
+        for uid, day, seconds in conn.execute("SELECT uid, day, seconds FROM user_days ORDER BY uid, day"):
+            data["activity"].setdefault(uid, ActivityRow()).add(parse_day_key(day), seconds)
+        for user_id, doc in conn.execute("SELECT user_id, doc FROM user_mutes"):
+            data["mutes"][user_id] = json.loads(doc)
+        return data
+
+    def _migrate_legacy_mutes(self, conn: sqlite3.Connection, data: Dict[str, Any]) -> None:
+        # databases created before the per-user mute index kept one row per mute_id
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mutes'").fetchone():
+            return
+        flat = {mute_id: json.loads(doc) for mute_id, doc in conn.execute("SELECT mute_id, doc FROM mutes")}
+        for uid, entry in index_mute_records(flat).items():
+            target = data["mutes"].setdefault(uid, {"active": [], "history": []})
+            target["active"].extend(entry["active"])
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO user_mutes VALUES (?, ?, ?)",
+                             [self._mute_row(uid, data["mutes"][uid]) for uid in {str(m.get("user")) for m in flat.values()}])
+            conn.execute("DROP TABLE mutes")
+
+    def import_document(self, doc: Dict[str, Any]) -> None:
+        """One-shot migration of a full JSON document (the mega_bot_data.json layout)."""
+        conn = self._connect()
+        normalize_activity(doc)
+        with conn:
+            for uid, u in doc.get("users", {}).items():
+                conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?)", self._user_row(uid, u))
+            for uid, row in doc["activity"].items():
+                conn.executemany("INSERT OR REPLACE INTO user_days VALUES (?, ?, ?)",
+                                 [(uid, day_key(day), sec) for day, sec in row.items()])
+            mutes = doc.get("mutes", {})
+            if not mutes_are_indexed(mutes):
+                mutes = index_mute_records(mutes)
+            for user_id, entry in mutes.items():
+                conn.execute("INSERT OR REPLACE INTO user_mutes VALUES (?, ?, ?)", self._mute_row(user_id, entry))
+            for mid, info in doc.get("images", {}).items():
+                conn.execute(MESSAGE_INSERT, self._message_row(mid, info))
+            for kind, entries in doc.get("logs", {}).items():
+                if kind not in LOG_SUBJECT_FIELDS:
+                    continue
+                conn.executemany(log_insert(kind), [self._log_row(kind, e) for e in entries])
+            for key, value in doc.items():
+                if key not in ("users", "activity", "mutes", "images", "logs"):
+                    conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, json.dumps(value, default=json_default)))
+
+    # --- row builders ---
+    @staticmethod
+    def _user_row(uid: str, u: Dict[str, Any]) -> tuple:
+        doc = {k: v for k, v in u.items() if k != "daily_seconds"}
+        return (uid, u.get("total_online_seconds", 0), json.dumps(doc, default=str))
+
+    @staticmethod
+    def _mute_row(user_id: str, entry: Dict[str, Any]) -> tuple:
+        return (user_id, len(entry.get("active", [])), json.dumps(entry, default=str))
+
+    @staticmethod
+    def _message_row(mid: str, info: Dict[str, Any]) -> tuple:
+        return (mid, info.get("author"), info.get("time"), int(bool(info.get("bulk_deleted"))), json.dumps(info, default=str), info.get("channel"))
+
+    @staticmethod
+    def _log_row(kind: str, entry: Dict[str, Any]) -> tuple:
+        return (entry.get("time"), entry.get(LOG_SUBJECT_FIELDS[kind]), json.dumps(entry, default=str), entry.get("channel"), int(bool(entry.get("bulk"))))
+
+    # --- writes ---
+    def resident(self, path: List[str]) -> bool:
+        return path[0] not in SQLITE_ONLY_SECTIONS
+
+    def record(self, ops: List[List[Any]]) -> None:
+        for kind, path, value in ops:
+            section = path[0]
+            if section == "users":
+                self.dirty_users.add(path[1])
+            elif section == "activity":
+                # a tally touches one day; a replaced row rewrites all of them
+                self.dirty_days.add((path[1], value[0] if kind == "tally" else None))
+            elif section == "mutes":
+                if len(path) == 1:
+                    self.all_mutes_dirty = True
+                else:
+                    self.dirty_mutes.add(path[1])
+            elif section == "images":
+                if kind == "del":
+                    self.rows.append(("DELETE FROM messages WHERE message_id = ?", (path[1],)))
+                else:
+                    self.rows.append((MESSAGE_INSERT, self._message_row(path[1], value)))
+            elif section == "logs":
+                log_kind = path[1]
+                if kind == "append" and log_kind in LOG_SUBJECT_FIELDS:
+                    self.rows.append((log_insert(log_kind), self._log_row(log_kind, value)))
+            else:
+                self.dirty_kv.add(section)
+
+    def _collect(self, data: Dict[str, Any]) -> List[tuple]:
+        """Turn the dirty sets into statements, reading current values from the resident data."""
+        stmts = self.rows
+        self.rows = []
+        users = data.get("users", {})
+        for uid in self.dirty_users:
+            if uid in users:
+                stmts.append(("INSERT OR REPLACE INTO users VALUES (?, ?, ?)", self._user_row(uid, users[uid])))
+            else:
+                stmts.append(("DELETE FROM users WHERE uid = ?", (uid,)))
+        activity = data.get("activity", {})
+        for uid, day in self.dirty_days:
+            row = activity.get(uid)
+            if day is None:
+                stmts.append(("DELETE FROM user_days WHERE uid = ?", (uid,)))
+                if row is not None:
+                    stmts.extend(("INSERT INTO user_days VALUES (?, ?, ?)", (uid, day_key(d), sec)) for d, sec in row.items())
+            else:
+                stmts.append(("INSERT OR REPLACE INTO user_days VALUES (?, ?, ?)", (uid, day_key(day), row.get(day) if row else 0)))
+        mutes = data.get("mutes", {})
+        if self.all_mutes_dirty:
+            stmts.append(("DELETE FROM user_mutes", ()))
+            self.dirty_mutes = set(mutes)
+            self.all_mutes_dirty = False
+        for user_id in self.dirty_mutes:
+            if user_id in mutes:
+                stmts.append(("INSERT OR REPLACE INTO user_mutes VALUES (?, ?, ?)", self._mute_row(user_id, mutes[user_id])))
+            else:
+                stmts.append(("DELETE FROM user_mutes WHERE user_id = ?", (user_id,)))
+        for key in self.dirty_kv:
+            stmts.append(("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, json.dumps(data.get(key), default=json_default))))
+        self.dirty_users, self.dirty_days, self.dirty_mutes, self.dirty_kv = set(), set(), set(), set()
+        return stmts
+
+    def _execute(self, stmts: List[tuple]) -> None:
+        conn = self._connect()
+        with conn:
+            for sql, params in stmts:
+                conn.execute(sql, params)
+
+    async def sync(self, data: Dict[str, Any]) -> None:
+        stmts = self._collect(data)
+        if stmts:
+            await self._run(self._execute, stmts)
+
+    def close(self, data: Dict[str, Any], dirty: bool) -> None:
+        stmts = self._collect(data)
+        if stmts:
+            self._execute(stmts)
+        self.executor.shutdown(wait=True)
+        if self.conn is not None:
+            self.conn.close()
+
+    def _prune(self) -> List[tuple]:
+        """Delete log/message rows past their count or age limit; returns them as (section, entry)."""
+        conn = self._connect()
+        now = datetime.datetime.utcnow()
+        evicted = []
+        with conn:
+            for kind in LOG_SUBJECT_FIELDS:
+                cap, days = log_retention(kind)
+                cutoff = format_time(now - datetime.timedelta(days=days))
+                rows = conn.execute(
+                    f"SELECT id, doc FROM log_{kind} WHERE time < ? OR id NOT IN "
+                    f"(SELECT id FROM log_{kind} ORDER BY id DESC LIMIT ?) ORDER BY id", (cutoff, cap)).fetchall()
+                conn.executemany(f"DELETE FROM log_{kind} WHERE id = ?", [(row_id,) for row_id, _ in rows])
+                evicted.extend((f"logs/{kind}", json.loads(doc)) for _, doc in rows)
+            cap, days = IMAGE_RETENTION
+            cutoff = format_time(now - datetime.timedelta(days=days))
+            rows = conn.execute(
+                "SELECT message_id, doc FROM messages WHERE time < ? OR message_id NOT IN "
+                "(SELECT message_id FROM messages ORDER BY time DESC, message_id DESC LIMIT ?) ORDER BY time", (cutoff, cap)).fetchall()
+            conn.executemany("DELETE FROM messages WHERE message_id = ?", [(mid,) for mid, _ in rows])
+            evicted.extend(("images", dict(json.loads(doc), message_id=mid)) for mid, doc in rows)
+        return evicted
+
+    def _export(self) -> Dict[str, Any]:
+        """Every table as one document, read on the sqlite thread between commits."""
+        conn = self._connect()
+        doc = self._read_resident(conn)
+        doc["images"] = {mid: json.loads(d) for mid, d in conn.execute("SELECT message_id, doc FROM messages ORDER BY time, message_id")}
+        for kind in LOG_SUBJECT_FIELDS:
+            doc["logs"][kind] = [json.loads(d) for (d,) in conn.execute(f"SELECT doc FROM log_{kind} ORDER BY id")]
+        return doc
+
+    async def backup_document(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._run(self._export)
+
+    async def enforce_retention(self, data: Dict[str, Any], policy: "RetentionPolicy") -> int:
+        # logs/images are not resident here, so count limits are applied by this sweep too
+        evicted = await self._run(self._prune)
+        for section, entry in evicted:
+            policy.archive.spill(section, entry)
+        return len(evicted)
+
+    # --- queries ---
+    def _page(self, table: str, cols: str, author_col: str, order: str, filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        clauses, params = [], []
+        for col, key in ((author_col, "author"), ("channel", "channel"), ("bulk", "bulk")):
+            if filters.get(key) is not None:
+                clauses.append(f"{col} = ?")
+                params.append(int(filters[key]))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT {cols} FROM {table}{where} ORDER BY {order} LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        return total, rows
+
+    async def page_images(self, data: Dict[str, Any], filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        total, rows = await self._run(self._page, "messages", "message_id, doc", "author", "time DESC, message_id DESC", filters, offset, limit)
+        return total, [(mid, json.loads(doc)) for mid, doc in rows]
+
+    async def page_log(self, data: Dict[str, Any], kind: str, filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        if kind not in LOG_SUBJECT_FIELDS:
+            return 0, []
+        total, rows = await self._run(self._page, f"log_{kind}", "doc", "subject", "id DESC", filters, offset, limit)
+        return total, [json.loads(doc) for (doc,) in rows]
+
+    def _export_rows(self, table: str, cols: str, after: int, window: Optional[tuple]) -> List[tuple]:
+        # keyset pagination on rowid: each call reads one batch, so memory stays flat
+        sql = f"SELECT rowid, {cols} FROM {table} WHERE rowid > ?"
+        params = [after]
+        if window is not None:
+            sql += " AND substr(time, 1, 10) BETWEEN ? AND ?"
+            params += list(window)
+        return self._connect().execute(sql + " ORDER BY rowid LIMIT ?", params + [EXPORT_BATCH]).fetchall()
+
+    async def export_batches(self, data: Dict[str, Any], section: str, window: Optional[tuple]):
+        if section not in SQLITE_ONLY_SECTIONS:
+            async for batch in super().export_batches(data, section, window):
+                yield batch
+            return
+        sources = [("messages", "message_id, doc", None)] if section == "images" \
+            else [(f"log_{kind}", "doc", kind) for kind in LOG_SUBJECT_FIELDS]
+        for table, cols, kind in sources:
+            after = 0
+            while True:
+                rows = await self._run(self._export_rows, table, cols, after, window)
+                if not rows:
+                    break
+                after = rows[-1][0]
+                yield [(row[1], json.loads(row[2])) if kind is None else (kind, json.loads(row[1])) for row in rows]
+
+def migrate_json_to_sqlite() -> None:
+    """One-shot: copy mega_bot_data.json (plus any pending journal records) into SQLITE_FILE."""
+    doc = JournalBackend(JOURNAL_FILE).load() if os.path.exists(JOURNAL_FILE) else load_data()
+    backend = SqliteBackend(SQLITE_FILE)
+    backend.import_document(doc)
+    backend.close(doc, False)
+    safe_print(f"✅ Migrated {DATA_FILE} into {SQLITE_FILE}. Set PERSISTENCE_MODE = \"sqlite\" to use it.")
+
+def make_storage_backend() -> StorageBackend:
+    if PERSISTENCE_MODE == "sqlite":
+        return SqliteBackend(SQLITE_FILE)
+    if PERSISTENCE_MODE == "journal":
+        return JournalBackend(JOURNAL_FILE)
+    return SnapshotBackend()
+
+# ------------------ RETENTION & ARCHIVE ------------------
+def log_retention(kind: str) -> tuple:
+    return LOG_RETENTION.get(kind, LOG_RETENTION_DEFAULT)
+
+def entry_time(entry: Dict[str, Any]) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.strptime(entry.get("time"), "%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return None
+
+class Archive:
+    """
+    Evicted log/image entries, appended as gzip JSON lines to ARCHIVE_DIR/<section>/<date>.jsonl.gz
+    and partitioned by the entry's own "time". Spills are buffered and written by the disk
+    writer on flush().
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.pending: Dict[tuple, List[str]] = collections.defaultdict(list)
+        self.spilled = 0
+
+    def spill(self, section: str, entry: Dict[str, Any]) -> None:
+        day = str(entry.get("time") or "")[:10] or datetime.datetime.utcnow().strftime("%Y-%m-%d")
+        self.pending[(section, day)].append(json.dumps(entry, separators=(",", ":"), default=str))
+        self.spilled += 1
+
+    def flush(self) -> concurrent.futures.Future:
+        """Hand buffered spills to the disk writer."""
+        if not self.pending:
+            return disk_writer.barrier()
+        pending, self.pending = self.pending, collections.defaultdict(list)
+        return disk_writer.submit(self._write, pending)
+
+    def _write(self, pending: Dict[tuple, List[str]]) -> None:
+        for (section, day), lines in pending.items():
+            folder = os.path.join(self.root, *section.split("/"))
+            try:
+                os.makedirs(folder, exist_ok=True)
+                # every flush adds one gzip member; gzip.open reads the members back as one stream
+                with gzip.open(os.path.join(folder, f"{day}.jsonl.gz"), "at", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except Exception as e:
+                safe_print("⚠️ archive write error:", e)
+
+class RetentionPolicy:
+    """
+    Keeps the resident logs.* and images bounded. Each log is a deque with maxlen set from
+    LOG_RETENTION, so an append never grows it past capacity; whatever falls out by count
+    or by age (expire) is spilled to the archive first. With no archive it only trims.
+    Every eviction is also queued in `evicted` as a trim/del op; DataStore hands those to
+    the backend so a journal replay reproduces the eviction instead of spilling it again.
+    """
+
+    def __init__(self, archive: Optional[Archive]):
+        self.archive = archive
+        self.evicted: List[List[Any]] = []
+
+    def drain(self) -> List[List[Any]]:
+        """The eviction ops queued since the last drain."""
+        ops, self.evicted = self.evicted, []
+        return ops
+
+    def ring(self, kind: str, entries=()) -> collections.deque:
+        cap = log_retention(kind)[0]
+        entries = list(entries)
+        excess = max(len(entries) - cap, 0)
+        for entry in entries[:excess]:
+            self.spill(f"logs/{kind}", entry)
+        if excess:
+            self.evicted.append(["trim", ["logs", kind], excess])
+        return collections.deque(entries[-cap:] if cap else [], maxlen=cap)
+
+    def attach(self, data: Dict[str, Any]) -> None:
+        """Turn loaded log lists into ring buffers and trim images, spilling the excess."""
+        logs = data.setdefault("logs", {})
+        for kind in list(logs):
+            logs[kind] = self.ring(kind, logs[kind])
+        images = data.setdefault("images", {})
+        while len(images) > IMAGE_RETENTION[0]:
+            self._evict_image(images, next(iter(images)))
+
+    def before_apply(self, data: Dict[str, Any], op: List[Any]) -> None:
+        kind, path, value = op
+        if kind == "append" and path[0] == "logs" and len(path) == 2:
+            logs = data.setdefault("logs", {})
+            buf = logs.get(path[1])
+            if not isinstance(buf, collections.deque):
+                buf = logs[path[1]] = self.ring(path[1], buf or ())
+            if buf.maxlen and len(buf) == buf.maxlen:
+                # the deque drops buf[0] on append; keep it in the archive
+                self.spill(f"logs/{path[1]}", buf[0])
+                self.evicted.append(["trim", path, 1])
+
+    def after_apply(self, data: Dict[str, Any], op: List[Any]) -> None:
+        kind, path, value = op
+        if path[0] == "logs" and len(path) <= 2 and kind != "append":
+            # a whole log (or the logs section) was replaced
+            self.attach(data)
+        elif path[0] == "images" and len(path) == 2 and kind == "set":
+            images = data["images"]
+            while len(images) > IMAGE_RETENTION[0]:
+                self._evict_image(images, next(iter(images)))
+
+    def expire(self, data: Dict[str, Any], now: Optional[datetime.datetime] = None) -> int:
+        """Spill entries past their age limit. Logs and images are kept in arrival order."""
+        now = now or datetime.datetime.utcnow()
+        expired = 0
+        for kind, buf in data.get("logs", {}).items():
+            cutoff = now - datetime.timedelta(days=log_retention(kind)[1])
+            dropped = 0
+            while buf and (entry_time(buf[0]) or now) < cutoff:
+                self.spill(f"logs/{kind}", buf.popleft())
+                dropped += 1
+            if dropped:
+                self.evicted.append(["trim", ["logs", kind], dropped])
+                expired += dropped
+        images = data.get("images", {})
+        cutoff = now - datetime.timedelta(days=IMAGE_RETENTION[1])
+        for mid in list(images):
+            if (entry_time(images[mid]) or now) >= cutoff:
+                break
+            self._evict_image(images, mid)
+            expired += 1
+        return expired
+
+    def spill(self, section: str, entry: Dict[str, Any]) -> None:
+        if self.archive is not None:
+            self.archive.spill(section, entry)
+
+    def _evict_image(self, images: Dict[str, Any], mid: str) -> None:
+        self.spill("images", dict(images.pop(mid), message_id=mid))
+        self.evicted.append(["del", ["images", mid], None])
+
+# ------------------ RESIDENT DATA STORE ------------------
+class DataStore:
+    """
+    The one authoritative copy of the bot data. Loaded once at startup; handlers change it
+    only through `apply()` / the op helpers so the storage backend sees every mutation.
+    Persistence happens in `flush()` (auto_save_task / store_sync_task) and on shutdown.
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = init_data_structure()
+        self.dirty = False
+        self.loaded = False
+        self.backend: StorageBackend = make_storage_backend()
+        self.retention = RetentionPolicy(Archive(ARCHIVE_DIR))
+
+    def load(self) -> None:
+        self.data = self.backend.load()
+        self.loaded = True
+        # older data files may miss newer top-level sections
+        for key, default in init_data_structure().items():
+            self.data.setdefault(key, default)
+        if not mutes_are_indexed(self.data["mutes"]):
+            safe_print("🛠️ Migrating mute records to the per-user index...")
+            self.set(["mutes"], index_mute_records(self.data["mutes"]))
+        converted = normalize_activity(self.data)
+        if converted:
+            safe_print("🛠️ Moved per-user daily/weekly/monthly seconds into activity rows.")
+            # record the kept monthly totals like any other change so every backend persists them
+            self.set(["activity_months"], self.data["activity_months"])
+        self.retention.attach(self.data)
+        evicted = self.retention.drain()
+        if evicted:
+            self.backend.record(evicted)
+        self.dirty = converted or bool(evicted) or not os.path.exists(DATA_FILE)
+
+    # --- mutations ---
+    def apply(self, *ops: List[Any]) -> None:
+        """
+        Apply ops to the resident data; the backend records them together as one batch,
+        each followed by the retention evictions it caused.
+        """
+        batch = []
+        for op in ops:
+            batch.append(op)
+            if self.backend.resident(op[1]):
+                self.retention.before_apply(self.data, op)
+                apply_op(self.data, op)
+                self.retention.after_apply(self.data, op)
+                batch.extend(self.retention.drain())
+        self.dirty = True
+        self.backend.record(batch)
+
+    def set(self, path: List[str], value: Any) -> None:
+        self.apply(["set", path, value])
+
+    def update(self, path: List[str], fields: Dict[str, Any]) -> None:
+        self.apply(["update", path, fields])
+
+    def append(self, path: List[str], value: Any) -> None:
+        self.apply(["append", path, value])
+
+    def incr(self, path: List[str], amount: int = 1) -> None:
+        self.apply(["incr", path, amount])
+
+    def delete(self, path: List[str]) -> None:
+        self.apply(["del", path, None])
+
+    # --- persistence ---
+    async def flush(self) -> bool:
+        """Persist anything changed since the last flush."""
+        async with data_lock:
+            await asyncio.wrap_future(self.retention.archive.flush())
+            if not self.dirty:
+                return False
+            self.dirty = False
+            await self.backend.sync(self.data)
+            return True
+
+    def durable(self) -> "asyncio.Task":
+        """Awaitable handle that resolves once every op applied so far is on disk."""
+        return asyncio.ensure_future(self.flush())
+
+    async def compact(self) -> None:
+        async with data_lock:
+            await self.backend.compact(self.data)
+
+    async def backup(self) -> str:
+        """Take a backup point of everything persisted so far; returns the point name."""
+        await self.flush()
+        async with data_lock:
+            doc = await self.backend.backup_document(self.data)
+        return await disk_writer.run(backups.take, doc)
+
+    async def enforce_retention(self) -> int:
+        """Age/count sweep of logs and images; returns how many entries went to the archive."""
+        async with data_lock:
+            spilled = await self.backend.enforce_retention(self.data, self.retention)
+            evicted = self.retention.drain()
+            if evicted:
+                self.backend.record(evicted)
+        if spilled:
+            self.dirty = True
+        return spilled
+
+    def close(self) -> None:
+        if not self.loaded:
+            # never let an unloaded (empty) store overwrite what is on disk
+            return
+        self.retention.archive.flush()
+        self.backend.close(self.data, self.dirty)
+        self.dirty = False
+        disk_writer.close()
+
+    # --- queries over the large collections ---
+    async def page_images(self, filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        return await self.backend.page_images(self.data, filters, offset, limit)
+
+    async def page_log(self, kind: str, filters: Dict[str, Any], offset: int, limit: int) -> tuple:
+        return await self.backend.page_log(self.data, kind, filters, offset, limit)
+
+    def export_batches(self, section: str, window: Optional[tuple]):
+        return self.backend.export_batches(self.data, section, window)
+
+store = DataStore()
+
+# ------------------ STREAMING EXPORT ------------------
+# !rdump writes JSON lines ({"section", "key", "value"}) one section at a time into a
+# gzip/zstd stream, cut into parts that each fit in an upload. Only one batch of records
+# and the part being written exist at any moment, however large the data is.
+EXPORT_SECTIONS = ("users", "activity", "mutes", "images", "logs", "other")
+
+def in_window(when: Optional[str], window: Optional[tuple]) -> bool:
+    """`window` is (first, last) "YYYY-MM-DD" inclusive, or None for everything."""
+    return window is None or window[0] <= (when or "")[:10] <= window[1]
+
+def clip_activity(row: "ActivityRow", window: Optional[tuple]) -> Optional["ActivityRow"]:
+    if window is None:
+        return row
+    first, last = parse_day_key(window[0]), parse_day_key(window[1])
+    a, b = max(first - row.start, 0), min(last - row.start + 1, len(row.seconds))
+    return ActivityRow(row.start + a, row.seconds[a:b]) if a < b else None
+
+def resident_export_records(data: Dict[str, Any], section: str, window: Optional[tuple]):
+    """(key, value) records of one section from the in-memory document."""
+    if section in ("users", "mutes"):
+        rows = data.get(section, {})
+        for key in list(rows):
+            if key in rows:
+                yield key, rows[key]
+    elif section == "activity":
+        rows = data.get("activity", {})
+        for key in list(rows):
+            row = clip_activity(rows[key], window) if key in rows else None
+            if row is not None:
+                yield key, row
+    elif section == "images":
+        images = data.get("images", {})
+        for mid in list(images):
+            info = images.get(mid)
+            if info is not None and in_window(info.get("time"), window):
+                yield mid, info
+    elif section == "logs":
+        for kind, entries in list(data.get("logs", {}).items()):
+            for entry in list(entries):
+                if in_window(entry.get("time"), window):
+                    yield kind, entry
+    elif section == "other":
+        for key, value in list(data.items()):
+            if key not in EXPORT_SECTIONS:
+                yield key, value
+
+class ExportStream:
+    """
+    Compressed JSON-lines output split into self-contained parts of at most `part_bytes`.
+    Each part is a complete gzip/zstd file ending on a record boundary. `write()` and
+    `finish()` do blocking I/O and compression: run them on the disk writer. They return
+    the path of a part once it is closed (the caller uploads and deletes it), else None.
+    """
+
+    def __init__(self, prefix: str, codec: str, part_bytes: int):
+        self.prefix = prefix
+        self.codec = codec
+        self.part_bytes = part_bytes
+        self.parts = 0
+        self.path: Optional[str] = None
+        self.file = None
+        self.compressor = None
+        self.written = 0
+
+    def _open(self) -> None:
+        self.parts += 1
+        self.path = f"{self.prefix}.part{self.parts:03d}.jsonl.{'zst' if self.codec == 'zstd' else 'gz'}"
+        self.file = open(self.path, "wb")
+        self.compressor = zstandard.ZstdCompressor(level=3).compressobj() if self.codec == "zstd" \
+            else zlib.compressobj(6, zlib.DEFLATED, 31)
+        self.written = 0
+
+    def write(self, payload: bytes) -> Optional[str]:
+        # a batch never compresses to more than its own size (plus what the compressor still
+        # buffers, covered by the margin), so close the part first if it might not fit
+        closed = None
+        if self.file is not None and self.written + len(payload) > max(self.part_bytes - EXPORT_PART_MARGIN, self.part_bytes // 2):
+            closed = self.finish()
+        if self.file is None:
+            self._open()
+        out = self.compressor.compress(payload)
+        self.file.write(out)
+        self.written += len(out)
+        return closed
+
+    def finish(self) -> Optional[str]:
+        if self.file is None:
+            return None
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        self.file = self.compressor = None
+        return self.path
+
+    def abort(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+def encode_export_batch(section: str, records: List[tuple]) -> bytes:
+    return "".join(json.dumps({"section": section, "key": k, "value": v}, default=json_default) + "\n"
+                   for k, v in records).encode("utf-8")
+
+def parse_dump_args(args: tuple) -> tuple:
+    """!rdump [sections...] [from:YYYY-MM-DD] [to:YYYY-MM-DD] [gzip|zstd] -> (sections, window, codec)."""
+    sections, first, last, codec = [], None, None, EXPORT_CODEC
+    for arg in args:
+        word = arg.lower()
+        if word in EXPORT_SECTIONS:
+            sections.append(word)
+        elif word in ("gzip", "zstd"):
+            codec = word
+        elif word.startswith(("from:", "to:")):
+            key, _, value = word.partition(":")
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"bad date `{value}` (use YYYY-MM-DD)")
+            if key == "from":
+                first = value
+            else:
+                last = value
+        else:
+            raise ValueError(f"unknown option `{arg}`; sections are {', '.join(EXPORT_SECTIONS)}")
+    if codec == "zstd" and zstandard is None:
+        codec = "gzip"
+    window = (first or "0000-01-01", last or "9999-12-31") if first or last else None
+    return sections or list(EXPORT_SECTIONS), window, codec
 
 # ------------------ USER DATA HELPERS ------------------
-def ensure_user_data(uid: str, data: Dict[str, Any]) -> None:
-    if uid not in data["users"]:
-        data["users"][uid] = {
+def ensure_user_data(uid: str) -> Dict[str, Any]:
+    if uid not in store.data["users"]:
+        store.set(["users", uid], {
             "status": "offline",
             "online_time": None,
             "offline_time": None,
@@ -165,28 +1758,20 @@ def ensure_user_data(uid: str, data: Dict[str, Any]) -> None:
             "last_edit_time": None,
             "last_delete": None,
             "last_online_times": {},
-            "offline_timer": 0,
+            "online_since": None,
             "total_online_seconds": 0,
-            "daily_seconds": {},
-            "weekly_seconds": {},
-            "monthly_seconds": {},
-            "average_online": 0.0,
             "notify": True
-        }
+        })
+    return store.data["users"][uid]
 
-def add_seconds_to_user(uid: str, seconds: int, data: Dict[str, Any]) -> None:
-    ensure_user_data(uid, data)
-    u = data["users"][uid]
-    u["total_online_seconds"] = u.get("total_online_seconds", 0) + seconds
-    today = datetime.datetime.utcnow().strftime("%Y-%m-%d")
-    week = datetime.datetime.utcnow().strftime("%Y-W%U")
-    month = datetime.datetime.utcnow().strftime("%Y-%m")
-    u["daily_seconds"][today] = u["daily_seconds"].get(today, 0) + seconds
-    u["weekly_seconds"][week] = u["weekly_seconds"].get(week, 0) + seconds
-    u["monthly_seconds"][month] = u["monthly_seconds"].get(month, 0) + seconds
-    total_time = u["total_online_seconds"]
-    total_days = max(len(u["daily_seconds"]), 1)
-    u["average_online"] = total_time / total_days
+def add_seconds_to_user(uid: str, seconds: int, when: Optional[datetime.datetime] = None) -> None:
+    ensure_user_data(uid)
+    day = day_number(when or datetime.datetime.utcnow())
+    store.apply(
+        ["incr", ["users", uid, "total_online_seconds"], seconds],
+        ["tally", ["activity", uid], [day, seconds]],
+    )
+    leaderboard.credit(uid, day, seconds)
 
 # ------------------ TIMEZONE / FORMAT HELPERS ------------------
 def tz_now_strings() -> Dict[str, str]:
@@ -252,12 +1837,13 @@ def build_timetrack_embed(member: discord.Member, user_data: Dict[str, Any]) ->
     embed.add_field(name="Last Online (4 TZ)", value="\n".join(tz_lines), inline=False)
 
     total = user_data.get("total_online_seconds", 0)
-    avg = int(user_data.get("average_online", 0))
+    summary = activity_summary(str(member.id))
     embed.add_field(name="Total Online (forever)", value=format_duration_seconds(total), inline=True)
-    embed.add_field(name="Average Daily Online", value=format_duration_seconds(avg), inline=True)
+    embed.add_field(name="Average Daily Online", value=format_duration_seconds(summary["average"]), inline=True)
+    embed.add_field(name="This Week", value=format_duration_seconds(summary["week"]), inline=True)
+    embed.add_field(name="This Month", value=format_duration_seconds(summary["month"]), inline=True)
 
-    today = datetime.datetime.utcnow().strftime("%Y-%m-%d")
-    todays = user_data.get("daily_seconds", {}).get(today, 0)
+    todays = summary["today"]
     embed.add_field(name="Today's Activity", value=f"{ascii_progress_bar(todays,3600)} ({todays}s)", inline=False)
 
     embed.set_footer(text="Timetrack • offline-delay 53s")
@@ -301,6 +1887,29 @@ def build_unmute_log_embed(target: discord.Member, moderator: Optional[discord.M
     embed.set_footer(text="Unmute event")
     return embed
 
+def build_bulk_mute_log_embed(targets: List[discord.Member], moderator: discord.Member, duration_str: str, reason: str, unmute_at: str) -> discord.Embed:
+    embed = discord.Embed(title=f"🔇 Bulk Mute ({len(targets)} users)", color=discord.Color.orange())
+    users = "\n".join(f"{t} ({t.id})" for t in targets)
+    embed.add_field(name="Users", value=users[:1024], inline=False)
+    embed.add_field(name="Moderator/Source", value=f"{moderator}", inline=False)
+    embed.add_field(name="Duration", value=duration_str, inline=True)
+    embed.add_field(name="Unmute At", value=unmute_at, inline=True)
+    embed.add_field(name="Reason", value=reason, inline=False)
+    embed.set_footer(text="Mute event logged")
+    return embed
+
+def build_bulk_mute_report_embed(results: List[tuple], duration_str: str) -> discord.Embed:
+    # per-target outcome for the invoker: (member, muted?, note)
+    ok = sum(1 for _, muted, _ in results if muted)
+    embed = discord.Embed(title=f"🔇 rmute: {ok}/{len(results)} muted for {duration_str}",
+                          color=discord.Color.green() if ok == len(results) else discord.Color.orange())
+    lines = []
+    for target, muted, note in results:
+        mark = "✅" if muted else "❌"
+        lines.append(f"{mark} {target.display_name}" + (f" — {note}" if note else ""))
+    embed.description = "\n".join(lines)[:4000]
+    return embed
+
 def build_purge_embed(actor: Optional[discord.Member], channel: discord.TextChannel, count: int, preview: List[str], when: str) -> discord.Embed:
     embed = discord.Embed(title="🗑️ Purge Detected", color=discord.Color.dark_red())
     embed.add_field(name="Channel", value=f"{channel.mention} ({channel.id})", inline=False)
@@ -314,6 +1923,129 @@ def build_purge_embed(actor: Optional[discord.Member], channel: discord.TextChan
     embed.set_footer(text=f"Purge at {when}")
     return embed
 
+# ------------------ TRACK CHANNEL PUBLISHER ------------------
+class LogPublisher:
+    """
+    Ordered outbound queue for the track channel. Handlers `publish()` text lines or embeds
+    and return immediately; one consumer packs them, in order, into messages of up to 10
+    embeds (and 2000 chars of text), flushing every LOG_FLUSH_INTERVAL seconds or as soon as
+    a message is full. Sends are paced to LOG_RATE_LIMIT messages per LOG_RATE_PERIOD so the
+    channel's bucket is never exhausted; items beyond LOG_QUEUE_MAX are dropped and counted.
+    An item with files ((path, filename) pairs, opened at send time) goes out in a message of its own.
+    """
+
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.queue: collections.deque = collections.deque()
+        self.pending = asyncio.Event()
+        self.full = asyncio.Event()
+        self.send_times: collections.deque = collections.deque()
+        self.task: Optional[asyncio.Task] = None
+        self.queued_embeds = 0
+        self.sent_messages = 0
+        self.sent_items = 0
+        self.dropped = 0
+        self.rate_limited = 0
+
+    def publish(self, content: Optional[str] = None, embed: Optional[discord.Embed] = None, files: Optional[List[tuple]] = None) -> None:
+        if len(self.queue) >= LOG_QUEUE_MAX:
+            self.dropped += 1
+            return
+        self.queue.append((content, embed, files or None))
+        self.pending.set()
+        if embed is not None:
+            self.queued_embeds += 1
+            if self.queued_embeds >= 10:
+                self.full.set()
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def stats(self) -> Dict[str, int]:
+        return {"depth": len(self.queue), "dropped": self.dropped, "sent_messages": self.sent_messages,
+                "sent_items": self.sent_items, "rate_limited": self.rate_limited}
+
+    def _next_message(self) -> tuple:
+        """Pop the longest prefix of the queue that fits in one message without reordering."""
+        lines: List[str] = []
+        embeds: List[discord.Embed] = []
+        files = None
+        text_len = 0
+        embed_chars = 0
+        while self.queue:
+            content, embed, files = self.queue[0]
+            if files and (lines or embeds):
+                files = None
+                break
+            if content is not None:
+                # text renders above embeds, so text after an embed starts a new message
+                if embeds or (lines and text_len + len(content) + 1 > 2000):
+                    break
+                lines.append(content[:2000])
+                text_len += len(lines[-1]) + 1
+            if embed is not None:
+                if len(embeds) == 10 or (embeds and embed_chars + len(embed) > 6000):
+                    if content is not None:
+                        lines.pop()
+                    break
+                embeds.append(embed)
+                embed_chars += len(embed)
+                self.queued_embeds -= 1
+            self.queue.popleft()
+            if files:
+                break
+        return ("\n".join(lines) or None), embeds, files, len(lines) + len(embeds)
+
+    async def _pace(self) -> None:
+        loop = asyncio.get_running_loop()
+        while len(self.send_times) >= LOG_RATE_LIMIT:
+            wait = self.send_times[0] + LOG_RATE_PERIOD - loop.time()
+            if wait <= 0:
+                self.send_times.popleft()
+            else:
+                await asyncio.sleep(wait)
+        self.send_times.append(loop.time())
+
+    async def _send(self, content: Optional[str], embeds: List[discord.Embed], files: Optional[List[tuple]], count: int) -> None:
+        channel = bot.get_channel(self.channel_id)
+        if not channel:
+            self.dropped += count
+            return
+        while True:
+            await self._pace()
+            try:
+                await channel.send(content=content, embeds=embeds, files=open_files(files or []))
+                self.sent_messages += 1
+                self.sent_items += count
+                return
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self.rate_limited += 1
+                    await asyncio.sleep(getattr(e, "retry_after", None) or LOG_RATE_PERIOD)
+                    continue
+                safe_print("⚠️ track channel send failed:", e)
+                self.dropped += count
+                return
+
+    async def _run(self) -> None:
+        while True:
+            await self.pending.wait()
+            try:
+                await asyncio.wait_for(self.full.wait(), LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            while self.queue:
+                try:
+                    await self._send(*self._next_message())
+                except Exception as e:
+                    safe_print("❌ publisher error:", e)
+                    traceback.print_exc()
+            self.pending.clear()
+            self.full.clear()
+
+publisher = LogPublisher(TRACK_CHANNEL_ID)
+
 # ------------------ COMMAND COOLDOWN HELPER ------------------
 def can_execute_command(user_id: int) -> bool:
     last = command_cooldowns.get(user_id, 0.0)
@@ -323,319 +2055,1139 @@ def can_execute_command(user_id: int) -> bool:
         return True
     return False
 
-# ------------------ PRESENCE TRACKER TASK ------------------
-@tasks.loop(seconds=PRESENCE_CHECK_INTERVAL)
-async def presence_tracker_task():
+# ------------------ PRESENCE ENGINE ------------------
+# Presence is driven by on_presence_update. A session starts when a tracked member comes
+# online (`online_since`, epoch seconds) and is credited from exact timestamps: at
+# checkpoints, and when the member has stayed offline for OFFLINE_DELAY seconds. Offline
+# blips shorter than OFFLINE_DELAY are debounced by a per-user timer and count as online.
+online_sessions: Set[str] = set()                      # uids with an open session
+offline_timers: Dict[str, tuple] = {}                  # uid -> (went_offline_ts, debounce task)
+presence_resumed = False
+
+# ------------------ TRACKED MEMBER INDEX ------------------
+# IDs of members holding any TRACK_ROLES role. Built once on ready from the roles' member
+# lists, then kept current from role diffs in on_member_update and join/remove events.
+# With LAZY_MEMBER_CHUNKING the member list is not chunked on connect: the index starts
+# from the snapshot saved last run and only those members are fetched (with presences).
+# Holders the snapshot missed (role granted while the bot was down) are found afterwards by
+# a REST scan of the member list. Without a snapshot (first run) the guild is chunked once.
+TRACK_ROLE_SET = set(TRACK_ROLES)
+tracked_member_ids: Set[int] = set()
+
+def is_tracked(member: discord.Member) -> bool:
+    return member.id in tracked_member_ids
+
+def has_tracked_role(member: discord.Member) -> bool:
+    return any(r.id in TRACK_ROLE_SET for r in member.roles)
+
+async def member_names(guild: discord.Guild, ids: List[int]) -> Dict[int, str]:
+    """Display names for `ids`; members missing from the cache are fetched in one query."""
+    names: Dict[int, str] = {}
+    missing = []
+    for mid in ids:
+        member = guild.get_member(mid)
+        if member:
+            names[mid] = member.display_name
+        else:
+            missing.append(mid)
+    if missing:
+        try:
+            for member in await guild.query_members(user_ids=missing[:MEMBER_QUERY_BATCH], cache=True):
+                names[member.id] = member.display_name
+        except asyncio.TimeoutError:
+            pass
+    return names
+
+def rebuild_tracked_index(guild: discord.Guild) -> None:
+    tracked_member_ids.clear()
+    for rid in TRACK_ROLES:
+        role = guild.get_role(rid)
+        if role:
+            tracked_member_ids.update(m.id for m in role.members)
+    leaderboard.invalidate()
+    save_tracked_snapshot()
+
+def save_tracked_snapshot() -> None:
+    store.set(["tracked_members"], sorted(tracked_member_ids))
+
+def restore_tracked_snapshot(guild: discord.Guild) -> bool:
+    """Warm start: the ids saved last run plus any holders already cached. False if there was no snapshot."""
+    snapshot = store.data.get("tracked_members") or []
+    tracked_member_ids.clear()
+    tracked_member_ids.update(int(mid) for mid in snapshot)
+    for rid in TRACK_ROLES:
+        role = guild.get_role(rid)
+        if role:
+            tracked_member_ids.update(m.id for m in role.members)
+    leaderboard.invalidate()
+    return bool(snapshot)
+
+async def fetch_tracked_members(guild: discord.Guild, ids: Optional[List[int]] = None) -> int:
+    """Load tracked members (all, or `ids`) with presences and reconcile their sessions."""
+    ids = sorted(tracked_member_ids) if ids is None else ids
+    loaded = 0
+    for i in range(0, len(ids), MEMBER_QUERY_BATCH):
+        batch = ids[i:i + MEMBER_QUERY_BATCH]
+        try:
+            members = await guild.query_members(user_ids=batch, presences=True, cache=True)
+        except asyncio.TimeoutError:
+            safe_print(f"⚠️ member query timed out ({len(batch)} ids), keeping them tracked")
+            continue
+        now_ts = int(time.time())
+        for uid in set(batch) - {m.id for m in members}:
+            # left the guild while we were down
+            tracked_member_ids.discard(uid)
+            close_session_quietly(str(uid), now_ts)
+        for member in members:
+            if has_tracked_role(member):
+                await reconcile_presence(member, now_ts)
+            else:
+                tracked_member_ids.discard(member.id)
+                close_session_quietly(str(member.id), now_ts)
+        loaded += len(members)
+    leaderboard.invalidate()
+    save_tracked_snapshot()
+    return loaded
+
+async def scan_role_holders(guild: discord.Guild) -> int:
+    """
+    REST pass over the member list (no presences, nothing cached) for TRACK_ROLES holders
+    missing from the index, e.g. given the role while the bot was down. Those are then
+    loaded like the snapshot members.
+    """
+    missing = [m.id async for m in guild.fetch_members(limit=None)
+               if m.id not in tracked_member_ids and has_tracked_role(m)]
+    if not missing:
+        return 0
+    tracked_member_ids.update(missing)
+    await fetch_tracked_members(guild, missing)
+    return len(missing)
+
+async def chunk_tracked_members(guild: discord.Guild) -> int:
+    """First run without a snapshot: chunk the guild once and build the index from the roles."""
+    await guild.chunk()
+    rebuild_tracked_index(guild)
+    await resume_presence_sessions()
+    return len(tracked_member_ids)
+
+async def refresh_tracked_member(member: discord.Member) -> None:
+    """Re-evaluate one member after a tracked role changed; opens/closes their session to match."""
+    now_tracked = has_tracked_role(member)
+    if now_tracked == is_tracked(member):
+        return
+    leaderboard.invalidate()
+    if now_tracked:
+        tracked_member_ids.add(member.id)
+        save_tracked_snapshot()
+        if member.status != discord.Status.offline:
+            await start_session(member, int(time.time()))
+    else:
+        tracked_member_ids.discard(member.id)
+        save_tracked_snapshot()
+        await stop_tracking(member)
+
+async def stop_tracking(member: discord.Member) -> None:
+    uid = str(member.id)
+    pending = offline_timers.pop(uid, None)
+    if pending:
+        pending[1].cancel()
+    if uid in online_sessions:
+        await end_session(member, pending[0] if pending else int(time.time()))
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    if member.guild.id == GUILD_ID and has_tracked_role(member):
+        tracked_member_ids.add(member.id)
+        leaderboard.invalidate()
+        save_tracked_snapshot()
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    if member.guild.id != GUILD_ID or not is_tracked(member):
+        return
+    tracked_member_ids.discard(member.id)
+    leaderboard.invalidate()
+    save_tracked_snapshot()
     try:
-        guild = bot.get_guild(GUILD_ID)
-        if not guild:
+        await stop_tracking(member)
+    except Exception as e:
+        safe_print("⚠️ on_member_remove error:", e)
+
+def credit_online_interval(uid: str, start_ts: int, end_ts: int) -> None:
+    """Credit [start_ts, end_ts) to the user, split at UTC midnight so each day gets its share."""
+    start = start_ts
+    while start < end_ts:
+        start_dt = datetime.datetime.utcfromtimestamp(start)
+        next_midnight = datetime.datetime.combine(start_dt.date() + datetime.timedelta(days=1), datetime.time())
+        piece_end = min(end_ts, int(next_midnight.replace(tzinfo=datetime.timezone.utc).timestamp()))
+        add_seconds_to_user(uid, piece_end - start, start_dt)
+        start = piece_end
+
+def checkpoint_session(uid: str, until_ts: int) -> None:
+    """Credit the open session up to `until_ts` and move its start forward."""
+    since = store.data["users"].get(uid, {}).get("online_since")
+    if since is None or until_ts <= since:
+        return
+    credit_online_interval(uid, since, until_ts)
+    store.set(["users", uid, "online_since"], until_ts)
+
+async def announce_presence(member: discord.Member, online: bool) -> None:
+    u = store.data["users"].get(str(member.id), {})
+    if not u.get("notify", True):
+        return
+    # respect rping settings: if user has disabled ping, replace mention with name
+    rping_disabled = store.data.get("rping_disabled_users", {}).get(str(member.id), False)
+    mention = member.mention if not rping_disabled else member.display_name
+    publisher.publish(f"✅ {mention} is online" if online else f"❌ {mention} is offline")
+
+async def start_session(member: discord.Member, now_ts: int) -> None:
+    uid = str(member.id)
+    ensure_user_data(uid)
+    store.update(["users", uid], {
+        "status": "online",
+        "online_time": format_time(datetime.datetime.utcfromtimestamp(now_ts)),
+        "online_since": now_ts,
+        "last_online_times": tz_now_strings()
+    })
+    online_sessions.add(uid)
+    await announce_presence(member, online=True)
+
+async def end_session(member: discord.Member, offline_ts: int) -> None:
+    uid = str(member.id)
+    checkpoint_session(uid, offline_ts)
+    store.update(["users", uid], {
+        "status": "offline",
+        "offline_time": format_time(datetime.datetime.utcfromtimestamp(offline_ts)),
+        "online_since": None,
+        "last_online_times": tz_now_strings()
+    })
+    online_sessions.discard(uid)
+    await announce_presence(member, online=False)
+
+async def confirm_offline(member: discord.Member, went_offline_ts: int) -> None:
+    await asyncio.sleep(OFFLINE_DELAY)
+    offline_timers.pop(str(member.id), None)
+    try:
+        await end_session(member, went_offline_ts)
+    except Exception as e:
+        safe_print("❌ confirm_offline error:", e)
+        traceback.print_exc()
+
+@bot.event
+async def on_presence_update(before: discord.Member, after: discord.Member):
+    try:
+        if after.guild.id != GUILD_ID or before.status == after.status:
             return
-        channel = bot.get_channel(TRACK_CHANNEL_ID)
-        if not channel:
+        if not is_tracked(after):
+            if LAZY_MEMBER_CHUNKING and has_tracked_role(after):
+                # cached holder not in the index yet (e.g. before the role holder scan reached them)
+                await refresh_tracked_member(after)
             return
-        data = load_data()
-        now_utc = datetime.datetime.utcnow()
-        for member in guild.members:
-            # only track if they have a tracked role
-            if not any(r.id in TRACK_ROLES for r in member.roles):
-                continue
-            uid = str(member.id)
-            ensure_user_data(uid, data)
-            u = data["users"][uid]
-            if member.status != discord.Status.offline:
-                # became online
-                if u.get("status") == "offline":
-                    u["status"] = "online"
-                    u["online_time"] = format_time(now_utc)
-                    u["offline_timer"] = 0
-                    u["last_online_times"] = tz_now_strings()
-                    # notify if allowed
-                    if u.get("notify", True):
-                        # respect rping settings for the owner
-                        # if user has disabled ping, replace mention with name
-                        recipient_id = member.id
-                        rping_disabled = data.get("rping_disabled_users", {}).get(str(recipient_id), False)
-                        mention = member.mention if not rping_disabled else member.display_name
-                        try:
-                            await channel.send(f"✅ {mention} is online")
-                        except:
-                            pass
-                # credit online seconds
-                add_seconds_to_user(uid, PRESENCE_CHECK_INTERVAL, data)
-            else:
-                # offline presence
-                if u.get("status") == "online":
-                    u["offline_timer"] = u.get("offline_timer", 0) + PRESENCE_CHECK_INTERVAL
-                    if u["offline_timer"] >= OFFLINE_DELAY:
-                        u["status"] = "offline"
-                        u["offline_time"] = format_time(now_utc)
-                        u["offline_timer"] = 0
-                        u["last_online_times"] = tz_now_strings()
-                        if u.get("notify", True):
-                            recipient_id = member.id
-                            rping_disabled = data.get("rping_disabled_users", {}).get(str(recipient_id), False)
-                            mention = member.mention if not rping_disabled else member.display_name
-                            try:
-                                await channel.send(f"❌ {mention} is offline")
-                            except:
-                                pass
-        save_data(data)
+        uid = str(after.id)
+        now_ts = int(time.time())
+        u = ensure_user_data(uid)
+        if after.status != discord.Status.offline:
+            pending = offline_timers.pop(uid, None)
+            if pending:
+                # back within OFFLINE_DELAY: the session never ended
+                pending[1].cancel()
+            if u.get("status") != "online":
+                await start_session(after, now_ts)
+        elif u.get("status") == "online" and uid not in offline_timers:
+            offline_timers[uid] = (now_ts, asyncio.create_task(confirm_offline(after, now_ts)))
+    except Exception as e:
+        safe_print("❌ on_presence_update error:", e)
+        traceback.print_exc()
+
+def resume_stored_sessions(now_ts: int) -> int:
+    """
+    Reopen the sessions stored as online for tracked members, before their live presence is
+    known. Time while the bot was down is unknown, so they resume counting from now.
+    """
+    resumed = 0
+    for member_id in tracked_member_ids:
+        uid = str(member_id)
+        u = store.data["users"].get(uid)
+        if u and u.get("status") == "online" and uid not in online_sessions:
+            store.set(["users", uid, "online_since"], now_ts)
+            online_sessions.add(uid)
+            resumed += 1
+    return resumed
+
+async def reconcile_presence(member: discord.Member, now_ts: int) -> None:
+    """Align one member's stored session with their live status once it is known."""
+    uid = str(member.id)
+    u = store.data["users"].get(uid)
+    stored_online = bool(u) and u.get("status") == "online"
+    if member.status != discord.Status.offline:
+        if not stored_online:
+            await start_session(member, now_ts)
+        elif uid not in online_sessions:
+            store.set(["users", uid, "online_since"], now_ts)
+            online_sessions.add(uid)
+    elif stored_online and uid not in offline_timers:
+        # close at the last checkpoint; nothing after it was observed
+        await end_session(member, u.get("online_since") or now_ts)
+
+def close_session_quietly(uid: str, now_ts: int) -> None:
+    """End a stored session for someone no longer tracked, without an announcement."""
+    u = store.data["users"].get(uid)
+    if not u or u.get("status") != "online":
+        return
+    if uid in online_sessions:
+        checkpoint_session(uid, now_ts)
+    store.update(["users", uid], {"status": "offline", "online_since": None})
+    online_sessions.discard(uid)
+
+async def resume_presence_sessions() -> None:
+    """Align stored sessions with the live guild once after startup (members already cached)."""
+    guild = bot.get_guild(GUILD_ID)
+    if not guild:
+        return
+    now_ts = int(time.time())
+    resume_stored_sessions(now_ts)
+    for member_id in list(tracked_member_ids):
+        member = guild.get_member(member_id)
+        if member:
+            await reconcile_presence(member, now_ts)
+        else:
+            close_session_quietly(str(member_id), now_ts)
+
+@tasks.loop(seconds=PRESENCE_CHECKPOINT_INTERVAL)
+async def presence_checkpoint_task():
+    # credit open sessions so totals stay current and a crash loses at most one interval
+    try:
+        now_ts = int(time.time())
+        for uid in list(online_sessions):
+            pending = offline_timers.get(uid)
+            checkpoint_session(uid, min(now_ts, pending[0]) if pending else now_ts)
     except Exception as e:
-        safe_print("❌ presence_tracker_task error:", e)
+        safe_print("❌ presence_checkpoint_task error:", e)
         traceback.print_exc()
 
 # ------------------ AUTO SAVE ------------------
 @tasks.loop(seconds=AUTO_SAVE_INTERVAL)
 async def auto_save_task():
     try:
-        save_data(load_data())
-        safe_print("💾 Auto-saved data.")
+        await attachments.flush()
+        if await store.flush():
+            safe_print("💾 Auto-saved data.")
     except Exception as e:
         safe_print("❌ auto_save_task error:", e)
         traceback.print_exc()
 
+# ------------------ STORE SYNC / COMPACTION ------------------
+@tasks.loop(seconds=STORE_SYNC_INTERVAL)
+async def store_sync_task():
+    # only started for incremental backends (journal / sqlite)
+    try:
+        await store.flush()
+        if store.backend.needs_compaction():
+            await store.compact()
+            safe_print("🗜️ Compacted journal into snapshot.")
+    except Exception as e:
+        safe_print("❌ store_sync_task error:", e)
+        traceback.print_exc()
+
+# ------------------ BACKUP POINTS ------------------
+@tasks.loop(seconds=BACKUP_INTERVAL)
+async def backup_task():
+    try:
+        name = await store.backup()
+        safe_print(f"🗃️ Backup point {name} written.")
+    except Exception as e:
+        safe_print("❌ backup_task error:", e)
+        traceback.print_exc()
+
+# ------------------ RETENTION SWEEP ------------------
+@tasks.loop(seconds=RETENTION_INTERVAL)
+async def retention_task():
+    try:
+        spilled = await store.enforce_retention()
+        if spilled:
+            safe_print(f"🗄️ Archived {spilled} expired log/image entries.")
+    except Exception as e:
+        safe_print("❌ retention_task error:", e)
+        traceback.print_exc()
+
+# ------------------ AUDIT LOG ATTRIBUTION ------------------
+class AuditCache:
+    """
+    Shared "who did this" service, fed in real time by on_audit_log_entry_create. Keeps a
+    rolling window of recent entries, deduplicated by entry id and indexed by (action,
+    target id). A handler asks for attribution of its event: an unclaimed matching entry
+    that already arrived is used right away, otherwise the event waits (up to
+    AUDIT_CORRELATION_WINDOW seconds) for the entry to be pushed. Each entry is claimed by
+    at most one event, oldest pending event first.
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, discord.AuditLogEntry] = {}
+        self.by_key: Dict[tuple, List[discord.AuditLogEntry]] = {}
+        self.claimed: Set[int] = set()
+        self.waiters: Dict[tuple, List[asyncio.Future]] = {}
+
+    @staticmethod
+    def target_id(entry: discord.AuditLogEntry) -> Optional[int]:
+        return getattr(entry.target, "id", None)
+
+    def ingest(self, entry: discord.AuditLogEntry) -> None:
+        if entry.id in self.entries:
+            return
+        self.prune()
+        key = (entry.action, self.target_id(entry))
+        self.entries[entry.id] = entry
+        bucket = self.by_key.setdefault(key, [])
+        bucket.append(entry)
+        bucket.sort(key=lambda e: e.id, reverse=True)    # snowflakes: newest first
+        # a stale entry (catch-up, late push) can't be the cause of an event waiting now
+        if entry.created_at < discord.utils.utcnow() - datetime.timedelta(seconds=AUDIT_ATTRIBUTION_WINDOW):
+            return
+        # hand it to the oldest event still waiting on this key
+        pending = self.waiters.get(key, [])
+        while pending:
+            fut = pending.pop(0)
+            if not fut.done():
+                self.claimed.add(entry.id)
+                fut.set_result(entry)
+                break
+        if not pending:
+            self.waiters.pop(key, None)
+
+    def prune(self) -> None:
+        cutoff = discord.utils.utcnow() - datetime.timedelta(seconds=AUDIT_CACHE_WINDOW)
+        stale = [eid for eid, e in self.entries.items() if e.created_at < cutoff]
+        for eid in stale:
+            e = self.entries.pop(eid)
+            self.claimed.discard(eid)
+            key = (e.action, self.target_id(e))
+            bucket = [x for x in self.by_key.get(key, []) if x.id != eid]
+            if bucket:
+                self.by_key[key] = bucket
+            else:
+                self.by_key.pop(key, None)
+
+    def lookup(self, action: discord.AuditLogAction, target_id: Optional[int],
+               max_age: int = AUDIT_ATTRIBUTION_WINDOW) -> Optional[discord.AuditLogEntry]:
+        """Oldest unclaimed recent entry for (action, target), claiming it."""
+        since = discord.utils.utcnow() - datetime.timedelta(seconds=max_age)
+        for entry in reversed(self.by_key.get((action, target_id), [])):
+            if entry.created_at >= since and entry.id not in self.claimed:
+                self.claimed.add(entry.id)
+                return entry
+        return None
+
+    async def attribute(self, action: discord.AuditLogAction, target_id: Optional[int],
+                        timeout: float = AUDIT_CORRELATION_WINDOW) -> Optional[discord.AuditLogEntry]:
+        hit = self.lookup(action, target_id)
+        if hit:
+            return hit
+        key = (action, target_id)
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(key, []).append(fut)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            pending = self.waiters.get(key)
+            if pending and fut in pending:
+                pending.remove(fut)
+            if not pending:
+                self.waiters.pop(key, None)
+
+class AuditActor(discord.Object):
+    """Stand-in for an actor who is not cached (LAZY_MEMBER_CHUNKING): renders as a mention."""
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    def __str__(self) -> str:
+        return self.mention
+
+def audit_actor(entry: Optional[discord.AuditLogEntry], guild: discord.Guild):
+    """The member/user behind an entry; gateway entries may only carry the user id."""
+    if entry is None:
+        return None
+    user_id = getattr(entry, "user_id", None)
+    return entry.user or guild.get_member(user_id or 0) or bot.get_user(user_id or 0) or (AuditActor(id=user_id) if user_id else None)
+
+audit_cache = AuditCache()
+
+@bot.event
+async def on_audit_log_entry_create(entry: discord.AuditLogEntry):
+    if entry.guild.id == GUILD_ID:
+        audit_cache.ingest(entry)
+        if audit_caught_up:
+            store.set(["audit_checkpoint"], entry.id)
+
 # ------------------ STARTUP: RECONCILE AUDIT LOGS ------------------
+# Catch-up reads every audit entry newer than the checkpoint in one oldest-first stream
+# (100 entries per API page) and keeps only RECONCILE_ACTIONS. The checkpoint is the id of
+# the last entry handled; it is saved after every page, so an interrupted catch-up resumes
+# where it stopped, and live entries advance it once the catch-up has finished.
+RECONCILE_ACTIONS = {
+    discord.AuditLogAction.role_create: "Role",
+    discord.AuditLogAction.role_delete: "Role",
+    discord.AuditLogAction.role_update: "Role",
+    discord.AuditLogAction.channel_create: "Channel",
+    discord.AuditLogAction.channel_delete: "Channel",
+    discord.AuditLogAction.channel_update: "Channel",
+    discord.AuditLogAction.message_bulk_delete: "Purge",
+    discord.AuditLogAction.member_role_update: "Member roles"
+}
+audit_caught_up = False
+
+def audit_summary_line(entry: discord.AuditLogEntry) -> str:
+    actor = entry.user
+    target = entry.target
+    who = f"{actor} ({actor.id})" if actor else "Unknown"
+    what = f"{target} ({getattr(target, 'id', target)})" if target is not None else "?"
+    line = f"`{entry.created_at.strftime('%Y-%m-%d %H:%M:%S')}` **{entry.action.name}** {what} by {who}"
+    if entry.action != discord.AuditLogAction.message_bulk_delete:
+        line += f" — {str(entry.changes)[:200]}"
+    return line
+
+class AuditSummary:
+    """Packs catch-up entries into a few summary embeds instead of one embed per entry."""
+
+    def __init__(self, since: str):
+        self.since = since
+        self.counts: Dict[str, int] = collections.Counter()
+        self.lines: List[str] = []
+        self.length = 0
+        self.embeds = 0
+        self.omitted = 0
+
+    def add(self, entry: discord.AuditLogEntry) -> None:
+        self.counts[f"{RECONCILE_ACTIONS[entry.action]}: {entry.action.name}"] += 1
+        if self.embeds >= AUDIT_SUMMARY_MAX_EMBEDS:
+            self.omitted += 1
+            return
+        line = audit_summary_line(entry)
+        if self.length + len(line) + 1 > 4000:
+            self.publish_lines()
+            if self.embeds >= AUDIT_SUMMARY_MAX_EMBEDS:
+                self.omitted += 1
+                return
+        self.lines.append(line)
+        self.length += len(line) + 1
+
+    def publish_lines(self) -> None:
+        """Post the lines gathered so far; call before the checkpoint moves past them."""
+        if not self.lines:
+            return
+        self.embeds += 1
+        publisher.publish(embed=discord.Embed(title=f"🕒 Missed While Offline ({self.embeds})", color=discord.Color.orange(),
+                                              description="\n".join(self.lines)))
+        self.lines, self.length = [], 0
+
+    def finish(self, pages: int, seconds: float) -> None:
+        self.publish_lines()
+        total = sum(self.counts.values())
+        if not total:
+            return
+        emb = discord.Embed(title="🕒 Audit Catch-up Summary", color=discord.Color.orange(),
+                            description=f"{total} entries since {self.since} ({pages} pages in {seconds:.1f}s)")
+        emb.add_field(name="By action", value="\n".join(f"{k}: {n}" for k, n in self.counts.most_common())[:1024], inline=False)
+        if self.omitted:
+            emb.add_field(name="Not listed", value=f"{self.omitted} entries beyond the first {AUDIT_SUMMARY_MAX_EMBEDS} summary embeds.", inline=False)
+        publisher.publish(embed=emb)
+
+def audit_checkpoint_start(data: Dict[str, Any]) -> tuple:
+    """(`after` for guild.audit_logs, human-readable start) from the saved checkpoint."""
+    if data.get("audit_checkpoint"):
+        return discord.Object(id=data["audit_checkpoint"]), f"entry {data['audit_checkpoint']}"
+    since = datetime.datetime.utcnow() - datetime.timedelta(seconds=AUDIT_LOOKBACK_SECONDS)
+    if data.get("last_audit_check"):
+        try:
+            since = datetime.datetime.fromisoformat(data["last_audit_check"])
+        except ValueError:
+            pass
+    return since.replace(tzinfo=datetime.timezone.utc), format_time(since)
+
 async def reconcile_audit_logs_on_start():
     """
-    Called after bot ready. Looks at audit logs since last_audit_check timestamp and posts missed events.
-    This attempts to catch up role/channel changes, member role updates and bulk deletes that happened
-    while the bot was offline.
+    Called after bot ready. Catches up role/channel changes, member role updates and bulk
+    deletes that happened while the bot was offline and posts them as a batched summary.
     """
+    global audit_caught_up
     try:
-        data = load_data()
         guild = bot.get_guild(GUILD_ID)
-        channel = bot.get_channel(TRACK_CHANNEL_ID)
-        if not guild or not channel:
+        if not guild:
             return
-        last_check_iso = data.get("last_audit_check")
-        now = datetime.datetime.utcnow()
-        lookback_since = now - datetime.timedelta(seconds=AUDIT_LOOKBACK_SECONDS)
-        # If last_check exists, use that; otherwise use lookback window
-        if last_check_iso:
-            try:
-                last_check_dt = datetime.datetime.fromisoformat(last_check_iso)
-            except:
-                last_check_dt = lookback_since
-        else:
-            last_check_dt = lookback_since
-
-        # We will check several audit log action types:
-        actions_to_check = [
-            discord.AuditLogAction.role_create,
-            discord.AuditLogAction.role_delete,
-            discord.AuditLogAction.role_update,
-            discord.AuditLogAction.channel_create,
-            discord.AuditLogAction.channel_delete,
-            discord.AuditLogAction.channel_update,
-            discord.AuditLogAction.message_bulk_delete,
-            discord.AuditLogAction.member_role_update
-        ]
-
-        for action in actions_to_check:
-            try:
-                async for entry in guild.audit_logs(limit=50, action=action):
-                    # audit entries are newest-first. We only want entries after last_check_dt
-                    if entry.created_at.replace(tzinfo=None) < last_check_dt:
-                        break
-                    # process entries depending on action
-                    if entry.action == discord.AuditLogAction.message_bulk_delete:
-                        # message purge — attribute
-                        target_channel = None
-                        # message_bulk_delete entries don't include target in API consistently; we'll mention actor
-                        actor = entry.user
-                        when = entry.created_at.strftime("%Y-%m-%d %H:%M:%S")
-                        emb = discord.Embed(title="🗑️ Missed Bulk Delete (while offline)", color=discord.Color.dark_red())
-                        emb.add_field(name="Possible actor", value=f"{actor} ({actor.id})", inline=False)
-                        emb.add_field(name="When", value=when, inline=False)
-                        emb.set_footer(text="Audit logs suggest a bulk delete occurred while bot was offline.")
-                        try:
-                            await channel.send(embed=emb)
-                        except:
-                            pass
-                    elif entry.action == discord.AuditLogAction.member_role_update:
-                        # member role added/removed while offline — try to attribute
-                        target = entry.target
-                        actor = entry.user
-                        changes = entry.changes
-                        change_desc = str(changes)
-                        emb = discord.Embed(title="🛡️ Missed Member Role Update", color=discord.Color.orange())
-                        emb.add_field(name="Member", value=f"{target} ({getattr(target,'id',str(target))})", inline=False)
-                        emb.add_field(name="Actor", value=f"{actor} ({actor.id})", inline=False)
-                        emb.add_field(name="Changes", value=change_desc, inline=False)
-                        emb.set_footer(text=f"At {entry.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-                        try:
-                            await channel.send(embed=emb)
-                        except:
-                            pass
-                    elif entry.action in (discord.AuditLogAction.role_update, discord.AuditLogAction.role_create, discord.AuditLogAction.role_delete):
-                        actor = entry.user
-                        target = entry.target
-                        emb = discord.Embed(title="⚙️ Missed Role Audit", color=discord.Color.orange())
-                        emb.add_field(name="Action", value=str(entry.action), inline=True)
-                        emb.add_field(name="Role", value=f"{target} ({getattr(target,'id',str(target))})", inline=True)
-                        emb.add_field(name="Actor", value=f"{actor} ({actor.id})", inline=False)
-                        emb.add_field(name="Changes", value=str(entry.changes), inline=False)
-                        emb.set_footer(text=f"At {entry.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-                        try:
-                            await channel.send(embed=emb)
-                        except:
-                            pass
-                    elif entry.action in (discord.AuditLogAction.channel_update, discord.AuditLogAction.channel_create, discord.AuditLogAction.channel_delete):
-                        actor = entry.user
-                        target = entry.target
-                        emb = discord.Embed(title="📢 Missed Channel Audit", color=discord.Color.blurple())
-                        emb.add_field(name="Action", value=str(entry.action), inline=True)
-                        emb.add_field(name="Channel", value=f"{target} ({getattr(target,'id',str(target))})", inline=True)
-                        emb.add_field(name="Actor", value=f"{actor} ({actor.id})", inline=False)
-                        emb.add_field(name="Changes", value=str(entry.changes), inline=False)
-                        emb.set_footer(text=f"At {entry.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-                        try:
-                            await channel.send(embed=emb)
-                        except:
-                            pass
-            except Exception as e:
-                safe_print("⚠️ audit log scanning error for action", action, e)
-        # record last audit check time
-        data["last_audit_check"] = datetime.datetime.utcnow().isoformat()
-        save_data(data)
+        after, since = audit_checkpoint_start(store.data)
+        summary = AuditSummary(since)
+        started = time.monotonic()
+        seen = pages = 0
+        last_id = None
+        async for entry in guild.audit_logs(limit=None, after=after, oldest_first=True):
+            seen += 1
+            last_id = entry.id
+            if entry.action in RECONCILE_ACTIONS:
+                audit_cache.ingest(entry)
+                summary.add(entry)
+            if seen % AUDIT_PAGE_SIZE == 0:
+                pages += 1
+                # an interrupted catch-up resumes after the checkpoint, so its entries must be posted first
+                summary.publish_lines()
+                store.set(["audit_checkpoint"], last_id)
+                await store.durable()
+        if seen % AUDIT_PAGE_SIZE:
+            pages += 1
+        if last_id is not None:
+            store.set(["audit_checkpoint"], last_id)
+        elif not store.data.get("audit_checkpoint"):
+            # nothing to catch up: start from now next time
+            store.set(["audit_checkpoint"], discord.utils.time_snowflake(datetime.datetime.now(datetime.timezone.utc)))
+        store.set(["last_audit_check"], datetime.datetime.utcnow().isoformat())
+        audit_caught_up = True
+        summary.finish(pages, time.monotonic() - started)
+        safe_print(f"🕒 Audit catch-up: {seen} entries in {pages} pages ({time.monotonic() - started:.1f}s).")
     except Exception as e:
         safe_print("❌ reconcile_audit_logs_on_start error:", e)
         traceback.print_exc()
 
 # ------------------ EVENT: READY (start reconcile) ------------------
+# Time-to-ready by phase, shown in !rstats. "ready" is when presence accounting is live;
+# member loading and the audit catch-up finish in the background after it.
+startup_started = time.monotonic()
+startup_phases: Dict[str, float] = {}
+startup_mark = startup_started
+
+def mark_phase(name: str) -> None:
+    global startup_mark
+    now = time.monotonic()
+    startup_phases[name] = now - startup_mark
+    startup_mark = now
+
+async def finish_startup(guild: Optional[discord.Guild], have_snapshot: bool) -> None:
+    try:
+        if guild and LAZY_MEMBER_CHUNKING:
+            if have_snapshot:
+                loaded = await fetch_tracked_members(guild)
+                mark_phase("members")
+            else:
+                loaded = await chunk_tracked_members(guild)
+                mark_phase("members (full chunk)")
+            safe_print(f"👥 Loaded {loaded} tracked members.")
+        # reconcile audit logs (catch up)
+        await reconcile_audit_logs_on_start()
+        mark_phase("audit catch-up")
+        if guild and LAZY_MEMBER_CHUNKING and have_snapshot:
+            found = await scan_role_holders(guild)
+            mark_phase("role holder scan")
+            if found:
+                safe_print(f"👥 Found {found} tracked members missing from the snapshot.")
+        total = time.monotonic() - startup_started
+        safe_print("⏱️ Startup: " + ", ".join(f"{k} {v:.1f}s" for k, v in startup_phases.items()) + f" (total {total:.1f}s)")
+    except Exception as e:
+        safe_print("⚠️ startup catch-up failed:", e)
+        traceback.print_exc()
+
 @bot.event
 async def on_ready():
     safe_print(f"✅ Logged in as: {bot.user} ({bot.user.id})")
+    global presence_resumed
+    guild = bot.get_guild(GUILD_ID)
+    if presence_resumed:
+        # reconnected with a fresh cache: reload the tracked members, sessions are already running
+        if guild and LAZY_MEMBER_CHUNKING:
+            asyncio.create_task(fetch_tracked_members(guild))
+        elif guild:
+            rebuild_tracked_index(guild)
+        return
+    presence_resumed = True
+    mark_phase("gateway")
+    have_snapshot = True
+    publisher.start()
+    ingest.start()
+    attachments.start()
+    mute_scheduler.start()
     # start tasks
-    presence_tracker_task.start()
-    auto_save_task.start()
-    # reconcile audit logs (catch up)
-    try:
-        await reconcile_audit_logs_on_start()
-    except Exception as e:
-        safe_print("⚠️ reconcile audit on start failed:", e)
+    if guild:
+        if LAZY_MEMBER_CHUNKING:
+            have_snapshot = restore_tracked_snapshot(guild)
+            resume_stored_sessions(int(time.time()))
+        else:
+            rebuild_tracked_index(guild)
+            await resume_presence_sessions()
+        safe_print(f"👥 Tracking {len(tracked_member_ids)} members.")
+    mark_phase("warm start")
+    if not presence_checkpoint_task.is_running():
+        presence_checkpoint_task.start()
+    if not auto_save_task.is_running():
+        auto_save_task.start()
+    if store.backend.incremental and not store_sync_task.is_running():
+        store_sync_task.start()
+    if not retention_task.is_running():
+        retention_task.start()
+    if not backup_task.is_running():
+        backup_task.start()
+    startup_phases["time to ready (total)"] = time.monotonic() - startup_started
     safe_print("📡 Presence tracker & auto-save started.")
+    asyncio.create_task(finish_startup(guild, have_snapshot))
+
+# ------------------ MESSAGE CACHE ------------------
+class CachedMessage:
+    __slots__ = ("author", "channel", "content", "attachments", "time", "size")
+
+    def __init__(self, author: int, channel: int, content: str, attachments: tuple, when: float):
+        self.author = author
+        self.channel = channel
+        self.content = content
+        self.attachments = attachments
+        self.time = when
+        self.size = MessageCache.OVERHEAD + len(content) + sum(len(a) for a in attachments)
+
+class MessageCache:
+    """
+    Compact copies of recent non-bot messages keyed by message id, so the raw delete/edit
+    events can be logged with content whether or not discord.py still has the message.
+    Least recently used entries are evicted past `budget` (approximate bytes) and entries
+    expire `ttl` seconds after they were cached.
+    """
+    OVERHEAD = 250               # rough per-entry cost of the record object and dict slot
+
+    def __init__(self, budget: int, ttl: int):
+        self.budget = budget
+        self.ttl = ttl
+        self.entries: "collections.OrderedDict[int, CachedMessage]" = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def put(self, message: discord.Message) -> None:
+        self.pop(message.id)
+        entry = CachedMessage(message.author.id, message.channel.id, (message.content or "")[:1900],
+                              tuple(a.url for a in message.attachments), time.time())
+        self.entries[message.id] = entry
+        self.bytes += entry.size
+        self._trim()
+
+    def get(self, message_id: int) -> Optional[CachedMessage]:
+        entry = self.entries.get(message_id)
+        if entry is not None and entry.time < time.time() - self.ttl:
+            self.pop(message_id)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(message_id)
+        return entry
+
+    def pop(self, message_id: int) -> Optional[CachedMessage]:
+        entry = self.entries.pop(message_id, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def edit(self, message_id: int, content: str) -> None:
+        entry = self.entries.get(message_id)
+        if entry is not None:
+            self.bytes -= entry.size
+            entry.size += len(content) - len(entry.content)
+            entry.content = content
+            self.bytes += entry.size
+            self._trim()
+
+    def _trim(self) -> None:
+        cutoff = time.time() - self.ttl
+        while self.entries:
+            oldest = next(iter(self.entries.values()))
+            if self.bytes <= self.budget and oldest.time >= cutoff:
+                break
+            self.bytes -= self.entries.popitem(last=False)[1].size
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "evicted": self.evicted,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+message_cache = MessageCache(MESSAGE_CACHE_BYTES, MESSAGE_CACHE_TTL)
+
+def record_deleted_message(message_id: int, entry: CachedMessage, bulk: bool) -> None:
+    when = format_time(datetime.datetime.utcnow())
+    image = {
+        "author": entry.author,
+        "channel": entry.channel,
+        "time": when,
+        "attachments": list(entry.attachments),
+        "content": entry.content,
+        "deleted_by": None
+    }
+    log = {
+        "message_id": message_id,
+        "author": entry.author,
+        "channel": entry.channel,
+        "content": entry.content,
+        "attachments": list(entry.attachments),
+        "time": when
+    }
+    if bulk:
+        image["bulk_deleted"] = log["bulk"] = True
+    files = attachments.pin(str(message_id))
+    if files:
+        image["files"] = files
+    store.set(["images", str(message_id)], image)
+    store.append(["logs", "deletions"], log)
+
+# ------------------ ATTACHMENT ARCHIVE ------------------
+class AttachmentStore:
+    """
+    Local copies of message attachments, so deleted images can be re-uploaded after their
+    CDN links die. on_message queues attachments (at most ATTACHMENT_MAX_BYTES each) and
+    ATTACHMENT_WORKERS downloaders fetch them, so memory stays within workers x max size
+    however many images are posted; past ATTACHMENT_QUEUE_MAX queued files new ones are dropped.
+
+      <root>/<ab>/<sha256>   file contents, stored once however many messages carry them
+      <root>/index.json      blob sizes in LRU order and message id -> [[sha256, filename], ...]
+
+    Blobs are evicted least recently used first once the total exceeds ATTACHMENT_QUOTA;
+    a deletion marks its blobs as just used, so deleted messages outlive ordinary traffic.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blobs: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self.messages: "collections.OrderedDict[str, List[list]]" = collections.OrderedDict()
+        self.total = 0
+        self.dirty = False
+        self.queue: collections.deque = collections.deque()
+        self.pending = asyncio.Event()
+        self.workers: List[asyncio.Task] = []
+        self.stored = 0
+        self.deduped = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def load(self) -> None:
+        path = os.path.join(self.root, "index.json")
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "rb") as f:
+                doc = json.loads(f.read())
+        except Exception as e:
+            safe_print("⚠️ attachment index unreadable, starting empty:", e)
+            return
+        for digest, size in doc.get("blobs", []):
+            if os.path.exists(self.path(digest)):
+                self.blobs[digest] = size
+                self.total += size
+        for mid, files in doc.get("messages", []):
+            self.messages[mid] = files
+
+    def encode_index(self) -> bytes:
+        """Call on the loop: _add/_evict/pin reorder the dicts between awaits."""
+        doc = {"blobs": list(self.blobs.items()), "messages": list(self.messages.items())}
+        return json.dumps(doc).encode("utf-8")
+
+    def save_index(self, payload: bytes) -> None:
+        """Blocking; run on the disk writer."""
+        os.makedirs(self.root, exist_ok=True)
+        write_atomic(os.path.join(self.root, "index.json"), payload)
+
+    async def flush(self) -> None:
+        if self.dirty:
+            self.dirty = False
+            try:
+                await disk_writer.run(self.save_index, self.encode_index())
+            except Exception:
+                # try again next cycle
+                self.dirty = True
+                raise
+
+    # --- prefetch ---
+    def prefetch(self, message: discord.Message) -> None:
+        for a in message.attachments:
+            if a.size > ATTACHMENT_MAX_BYTES:
+                self.skipped += 1
+            elif len(self.queue) >= ATTACHMENT_QUEUE_MAX:
+                self.dropped += 1
+            else:
+                self.queue.append((str(message.id), a))
+                self.pending.set()
+
+    def start(self) -> None:
+        self.workers = [t for t in self.workers if not t.done()]
+        while len(self.workers) < ATTACHMENT_WORKERS:
+            self.workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            if not self.queue:
+                self.pending.clear()
+                await self.pending.wait()
+                continue
+            mid, attachment = self.queue.popleft()
+            try:
+                payload = await attachment.read()
+                digest, created = await disk_writer.run(self._write_blob, payload)
+                self._add(mid, digest, len(payload), attachment.filename, created)
+            except Exception as e:
+                # deleted before we got to it, expired link, network error...
+                self.failed += 1
+                safe_print("⚠️ attachment download failed:", e)
+
+    def _write_blob(self, payload: bytes) -> tuple:
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, payload)
+        return digest, True
+
+    def _add(self, mid: str, digest: str, size: int, filename: str, created: bool) -> None:
+        if digest not in self.blobs:
+            self.blobs[digest] = size
+            self.total += size
+        self.blobs.move_to_end(digest)
+        if created:
+            self.stored += 1
+        else:
+            self.deduped += 1
+        self.messages.setdefault(mid, []).append([digest, filename])
+        self.messages.move_to_end(mid)
+        while len(self.messages) > ATTACHMENT_INDEX_MAX:
+            self.messages.popitem(last=False)
+        self._evict()
+        self.dirty = True
+
+    def _evict(self) -> None:
+        while self.total > ATTACHMENT_QUOTA and len(self.blobs) > 1:
+            digest, size = self.blobs.popitem(last=False)
+            self.total -= size
+            disk_writer.submit(remove_quietly, self.path(digest))
+
+    # --- lookups ---
+    def pin(self, mid: str) -> List[list]:
+        """[[sha256, filename], ...] stored for a message, marked as most recently used."""
+        files = [f for f in self.messages.get(mid, []) if f[0] in self.blobs]
+        for digest, _ in files:
+            self.blobs.move_to_end(digest)
+        if files:
+            self.dirty = True
+        return files
+
+    def upload_set(self, files: List[list], limit_bytes: int) -> List[tuple]:
+        """(path, filename) for as many stored files as fit in one message."""
+        out, total = [], 0
+        for digest, filename in files:
+            size = self.blobs.get(digest)
+            if size is None or len(out) >= 10 or total + size > limit_bytes:
+                continue
+            out.append((self.path(digest), filename))
+            total += size
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"blobs": len(self.blobs), "bytes": self.total, "queued": len(self.queue), "stored": self.stored,
+                "deduped": self.deduped, "skipped": self.skipped, "dropped": self.dropped, "failed": self.failed}
+
+def archived_files(mid: str, info: Dict[str, Any]) -> List[list]:
+    # the download may finish after the deletion was recorded, so fall back to the index
+    return [f for f in info.get("files") or attachments.pin(mid) if f[0] in attachments.blobs]
+
+def remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def open_files(upload: List[tuple]) -> List[discord.File]:
+    return [discord.File(path, filename=filename) for path, filename in upload if os.path.exists(path)]
+
+attachments = AttachmentStore(ATTACHMENT_DIR)
+
+# ------------------ INGESTION PIPELINE ------------------
+INGEST_FIELDS = {
+    "message": ("last_message", "last_message_time"),
+    "edit": ("last_edit", "last_edit_time")
+}
+
+class IngestPipeline:
+    """
+    Per-message activity updates (a user's latest message/edit) go through here so event
+    handlers and command dispatch never wait on the store. Handlers `push()` a small tuple
+    and return; one consumer applies the queue in batches every INGEST_BATCH_INTERVAL
+    seconds or as soon as INGEST_BATCH_SIZE events are waiting, writing each user's fields
+    once per batch however many messages they sent.
+    """
+
+    def __init__(self):
+        self.queue: collections.deque = collections.deque()
+        self.pending = asyncio.Event()
+        self.full = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.applied = 0
+        self.batches = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.recent: collections.deque = collections.deque()   # (monotonic time, events applied)
+
+    def push(self, kind: str, uid: str, content: str) -> None:
+        if len(self.queue) >= INGEST_QUEUE_MAX:
+            self.dropped += 1
+            return
+        self.queue.append((kind, uid, content, format_time(datetime.datetime.utcnow()), time.monotonic()))
+        self.received += 1
+        self.pending.set()
+        if len(self.queue) >= INGEST_BATCH_SIZE:
+            self.full.set()
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def drain(self) -> int:
+        """Apply everything queued now (commands that read the fields, shutdown)."""
+        n = 0
+        while self.queue:
+            n += self._apply(min(len(self.queue), INGEST_BATCH_SIZE))
+        return n
+
+    def _apply(self, count: int) -> int:
+        updates: Dict[str, Dict[str, Any]] = {}
+        now = time.monotonic()
+        self.last_lag = now - self.queue[0][4]
+        for _ in range(count):
+            kind, uid, content, when, _ = self.queue.popleft()
+            text_field, time_field = INGEST_FIELDS[kind]
+            updates.setdefault(uid, {}).update({text_field: content, time_field: when})
+        for uid, fields in updates.items():
+            ensure_user_data(uid)
+            store.update(["users", uid], fields)
+        self.applied += count
+        self.batches += 1
+        self.recent.append((now, count))
+        while self.recent and self.recent[0][0] < now - INGEST_RATE_WINDOW:
+            self.recent.popleft()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        window = sum(n for t, n in self.recent if t >= now - INGEST_RATE_WINDOW)
+        return {
+            "depth": len(self.queue),
+            "rate": window / INGEST_RATE_WINDOW,
+            "lag": now - self.queue[0][4] if self.queue else 0.0,
+            "last_lag": self.last_lag,
+            "received": self.received,
+            "batches": self.batches,
+            "dropped": self.dropped
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await self.pending.wait()
+            try:
+                await asyncio.wait_for(self.full.wait(), INGEST_BATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                while self.queue:
+                    self._apply(min(len(self.queue), INGEST_BATCH_SIZE))
+                    await asyncio.sleep(0)
+            except Exception as e:
+                safe_print("❌ ingest pipeline error:", e)
+                traceback.print_exc()
+            self.pending.clear()
+            self.full.clear()
+
+ingest = IngestPipeline()
 
 # ------------------ MESSAGE EVENTS (edits, deletes, bulk) ------------------
 @bot.event
 async def on_message(message: discord.Message):
     if message.author and message.author.bot:
         return
-    data = load_data()
-    uid = str(message.author.id)
-    ensure_user_data(uid, data)
-    data["users"][uid]["last_message"] = (message.content or "")[:1900]
-    data["users"][uid]["last_message_time"] = format_time(datetime.datetime.utcnow())
-    # cache attachments if any
+    message_cache.put(message)
     if message.attachments:
-        attachments = [a.url for a in message.attachments]
-        data["images"][str(message.id)] = {
-            "author": message.author.id,
-            "time": format_time(datetime.datetime.utcnow()),
-            "attachments": attachments,
-            "content": (message.content or "")[:1900],
-            "deleted_by": None
-        }
-    save_data(data)
+        attachments.prefetch(message)
+    ingest.push("message", str(message.author.id), (message.content or "")[:1900])
     await bot.process_commands(message)
 
 @bot.event
-async def on_message_edit(before: discord.Message, after: discord.Message):
-    if after.author and after.author.bot:
+async def on_raw_message_edit(payload: discord.RawMessageUpdateEvent):
+    if "content" not in payload.data:
+        return      # embed unfurls and similar updates carry no content
+    author = payload.data.get("author") or {}
+    if author.get("bot"):
         return
-    data = load_data()
-    uid = str(after.author.id)
-    ensure_user_data(uid, data)
-    data["users"][uid]["last_edit"] = (after.content or "")[:1900]
-    data["users"][uid]["last_edit_time"] = format_time(datetime.datetime.utcnow())
+    cached = message_cache.get(payload.message_id)
+    if cached is None and not author:
+        return
+    before = cached.content if cached is not None else None
+    after = (payload.data.get("content") or "")[:1900]
+    if before == after:
+        return
+    author_id = cached.author if cached is not None else int(author["id"])
+    message_cache.edit(payload.message_id, after)
+    ingest.push("edit", str(author_id), after)
     # log edit
-    data["logs"].setdefault("edits", []).append({
-        "message_id": after.id,
-        "author": after.author.id,
-        "before": (before.content or "")[:1900],
-        "after": (after.content or "")[:1900],
+    store.append(["logs", "edits"], {
+        "message_id": payload.message_id,
+        "author": author_id,
+        "channel": payload.channel_id,
+        "before": before,
+        "after": after,
         "time": format_time(datetime.datetime.utcnow())
     })
-    save_data(data)
 
 @bot.event
-async def on_message_delete(message: discord.Message):
+async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
     # single message deletion — we cache and try to attribute later
-    if message.author and message.author.bot:
-        return
-    data = load_data()
     try:
-        attachments = [a.url for a in message.attachments] if message.attachments else []
-        data["images"][str(message.id)] = {
-            "author": message.author.id if message.author else None,
-            "time": format_time(datetime.datetime.utcnow()),
-            "attachments": attachments,
-            "content": (message.content or "")[:1900],
-            "deleted_by": None
-        }
-        data["logs"].setdefault("deletions", []).append({
-            "message_id": message.id,
-            "author": message.author.id if message.author else None,
-            "content": (message.content or "")[:1900],
-            "attachments": attachments,
-            "time": format_time(datetime.datetime.utcnow())
-        })
+        entry = message_cache.pop(payload.message_id)
+        if entry is None:
+            return  # a bot's message, or older than the cache
+        record_deleted_message(payload.message_id, entry, False)
     except Exception as e:
-        safe_print("⚠️ on_message_delete error:", e)
-    save_data(data)
+        safe_print("⚠️ on_raw_message_delete error:", e)
 
 @bot.event
-async def on_bulk_message_delete(messages: List[discord.Message]):
-    data = load_data()
-    guild = None
-    try:
-        if messages:
-            guild = messages[0].guild
-    except:
-        guild = None
+async def on_raw_bulk_message_delete(payload: discord.RawBulkMessageDeleteEvent):
+    guild = bot.get_guild(payload.guild_id) if payload.guild_id else None
+    channel = guild.get_channel_or_thread(payload.channel_id) if guild else None
     # cache and create a preview
     preview = []
-    for m in messages[:15]:
-        author_name = (m.author.display_name if m.author else "Unknown")
-        preview.append(f"{author_name}: {(m.content or '')[:120]}")
-        data["images"][str(m.id)] = {
-            "author": m.author.id if m.author else None,
-            "time": format_time(datetime.datetime.utcnow()),
-            "attachments": [a.url for a in m.attachments] if m.attachments else [],
-            "content": (m.content or "")[:1900],
-            "deleted_by": None,
-            "bulk_deleted": True
-        }
-        data["logs"].setdefault("deletions", []).append({
-            "message_id": m.id,
-            "author": m.author.id if m.author else None,
-            "content": (m.content or "")[:1900],
-            "attachments": [a.url for a in m.attachments] if m.attachments else [],
-            "bulk": True,
-            "time": format_time(datetime.datetime.utcnow())
-        })
-    # try to attribute via audit logs (message_bulk_delete)
-    actor = None
+    files = []
+    for mid in sorted(payload.message_ids):
+        entry = message_cache.pop(mid)
+        if entry is None:
+            continue
+        record_deleted_message(mid, entry, True)
+        files.extend(attachments.pin(str(mid)))
+        if len(preview) < 15:
+            member = guild.get_member(entry.author) if guild else None
+            author_name = member.display_name if member else str(entry.author)
+            preview.append(f"{author_name}: {entry.content[:120]}")
+    # try to attribute via audit logs (message_bulk_delete targets the purged channel)
     probable_actor = None
-    try:
-        if guild:
-            async for entry in guild.audit_logs(limit=12, action=discord.AuditLogAction.message_bulk_delete):
-                # find the most recent bulk delete entry
-                # use created_at to pick likely one
-                probable_actor = entry.user
-                break
-    except Exception as e:
-        safe_print("⚠️ audit log check bulk delete failed:", e)
+    if guild:
+        entry = await audit_cache.attribute(discord.AuditLogAction.message_bulk_delete, payload.channel_id)
+        probable_actor = audit_actor(entry, guild)
     # send embed to track channel
-    channel = bot.get_channel(TRACK_CHANNEL_ID)
+    if channel is None:
+        return
     when = format_time(datetime.datetime.utcnow())
-    emb = build_purge_embed(probable_actor, messages[0].channel if messages else channel, len(messages), preview, when)
-    if channel:
-        try:
-            await channel.send(embed=emb)
-        except:
-            pass
-    save_data(data)
+    upload = attachments.upload_set(files, guild.filesize_limit) if guild else []
+    publisher.publish(embed=build_purge_embed(probable_actor, channel, len(payload.message_ids), preview, when), files=upload)
 
 # ------------------ MEMBER UPDATE (role adds/removes) ATTRIBUTION ------------------
 @bot.event
@@ -650,26 +3202,19 @@ async def on_member_update(before: discord.Member, after: discord.Member):
         after_roles = {r.id for r in after.roles}
         added = after_roles - before_roles
         removed = before_roles - after_roles
-        data = load_data()
+        if (added | removed) & TRACK_ROLE_SET:
+            await refresh_tracked_member(after)
+        if not added and not removed:
+            return
         guild = after.guild
-        channel = bot.get_channel(TRACK_CHANNEL_ID)
+        # one attribution lookup covers every role in this update
+        entry = await audit_cache.attribute(discord.AuditLogAction.member_role_update, after.id)
+        who = audit_actor(entry, guild)
         # handle additions
         if added:
             for rid in added:
                 # log member role add
-                who = None
-                # look at audit logs member_role_update to attribute actor
-                try:
-                    async for entry in guild.audit_logs(limit=20, action=discord.AuditLogAction.member_role_update):
-                        # entry.target is a Member
-                        if getattr(entry.target, "id", None) == after.id:
-                            # changes might include 'roles'
-                            who = entry.user
-                            break
-                except Exception as e:
-                    safe_print("⚠️ audit lookup for member role add failed:", e)
-                # write log entry
-                data["logs"].setdefault("member_role_changes", []).append({
+                store.append(["logs", "member_role_changes"], {
                     "member": after.id,
                     "role_added": rid,
                     "by": who.id if who else None,
@@ -678,13 +3223,11 @@ async def on_member_update(before: discord.Member, after: discord.Member):
                 })
                 # If it is RMUTE role -> handle mute event
                 if rid == RMUTE_ROLE_ID:
-                    # determine duration if known
-                    # search data["mutes"] for a matching record with 'user' == after.id and not yet removed
-                    found_mute_entry = None
-                    for mid, m in data.get("mutes", {}).items():
-                        if m.get("user") == after.id:
-                            found_mute_entry = (mid, m)
-                            break
+                    # determine duration if known: the user's newest active mute record
+                    found = active_mute(after.id)
+                    if found and (who is None or who.id == bot.user.id):
+                        # the bot's own !rmute/!runmute, which already DMed the user and logged it
+                        continue
                     moderator_member = who
                     source = None
                     if moderator_member:
@@ -696,34 +3239,25 @@ async def on_member_update(before: discord.Member, after: discord.Member):
                         # duration if present
                         dur = None
                         unmute_at = None
-                        if found_mute_entry:
-                            dur = format_duration_seconds(found_mute_entry[1].get("duration_seconds", 0))
-                            unmute_at = found_mute_entry[1].get("unmute_utc")
+                        if found:
+                            dur = format_duration_seconds(found.get("duration_seconds", 0))
+                            unmute_at = found.get("unmute_utc")
                         # DM the user with fancy embed
-                        dm_embed = build_mute_dm_embed(after, moderator_member if moderator_member else bot.user, dur, found_mute_entry[1].get("reason","No reason provided") if found_mute_entry else "Muted (by role add)", auto=False)
+                        dm_embed = build_mute_dm_embed(after, moderator_member if moderator_member else bot.user, dur, found.get("reason","No reason provided") if found else "Muted (by role add)", auto=False)
                         try:
                             await after.send(embed=dm_embed)
                         except:
                             # user DMs blocked
                             pass
                         # log to channel
-                        if channel:
-                            log_embed = build_mute_log_embed(after, moderator_member, dur, found_mute_entry[1].get("reason","No reason provided") if found_mute_entry else "Muted (role added)", unmute_at, source=source)
-                            await channel.send(embed=log_embed)
+                        log_embed = build_mute_log_embed(after, moderator_member, dur, found.get("reason","No reason provided") if found else "Muted (role added)", unmute_at, source=source)
+                        publisher.publish(embed=log_embed)
                     except Exception as e:
                         safe_print("⚠️ member role add RMUTE handling error:", e)
         # handle removals (unmute or role removed)
         if removed:
             for rid in removed:
-                who = None
-                try:
-                    async for entry in guild.audit_logs(limit=20, action=discord.AuditLogAction.member_role_update):
-                        if getattr(entry.target, "id", None) == after.id:
-                            who = entry.user
-                            break
-                except Exception as e:
-                    safe_print("⚠️ audit lookup for member role remove failed:", e)
-                data["logs"].setdefault("member_role_changes", []).append({
+                store.append(["logs", "member_role_changes"], {
                     "member": after.id,
                     "role_removed": rid,
                     "by": who.id if who else None,
@@ -738,23 +3272,12 @@ async def on_member_update(before: discord.Member, after: discord.Member):
                         source = f"{moderator_member} ({moderator_member.id})"
                     else:
                         source = "Unknown (possibly bot)"
-                    # find mute record and remove it
-                    removed_record_id = None
-                    for mid, m in data.get("mutes", {}).items():
-                        if m.get("user") == after.id:
-                            removed_record_id = mid
-                            break
-                    if removed_record_id:
-                        # remove mute record
-                        data["mutes"].pop(removed_record_id, None)
-                    save_data(data)
+                    # role is gone, so every active mute for this user has ended
+                    ops = end_mute_ops(after.id, ended_by=moderator_member.id if moderator_member else None)
+                    if ops:
+                        store.apply(*ops)
                     # log to channel
-                    ch = bot.get_channel(TRACK_CHANNEL_ID)
-                    try:
-                        if ch:
-                            await ch.send(embed=build_unmute_log_embed(after, moderator_member, reason=None, auto=False, source=source))
-                    except:
-                        pass
+                    publisher.publish(embed=build_unmute_log_embed(after, moderator_member, reason=None, auto=False, source=source))
     except Exception as e:
         safe_print("⚠️ on_member_update error:", e)
         traceback.print_exc()
@@ -765,29 +3288,19 @@ async def on_guild_role_update(before: discord.Role, after: discord.Role):
     # attempt to attribute who updated the role
     try:
         guild = after.guild
-        actor = None
-        try:
-            async for entry in guild.audit_logs(limit=6, action=discord.AuditLogAction.role_update):
-                if getattr(entry.target, "id", None) == after.id:
-                    actor = entry.user
-                    changes = entry.changes
-                    break
-        except Exception as e:
-            safe_print("⚠️ role_update audit lookup failed:", e)
-            changes = None
+        entry = await audit_cache.attribute(discord.AuditLogAction.role_update, after.id)
+        actor = audit_actor(entry, guild)
+        changes = entry.changes if entry else None
         # compose embed
         embed = discord.Embed(title="⚙️ Role Updated", color=discord.Color.orange())
         embed.add_field(name="Role", value=f"{after.name} ({after.id})", inline=False)
         embed.add_field(name="Edited by", value=f"{actor} ({actor.id})" if actor else "Unknown", inline=False)
         embed.add_field(name="Before (name/perms)", value=f"{before.name} / {str(before.permissions)}", inline=False)
         embed.add_field(name="After (name/perms)", value=f"{after.name} / {str(after.permissions)}", inline=False)
-        embed.add_field(name="Changes (raw)", value=str(getattr(locals().get('changes', {}), '__str__', lambda: '{}')()) or "N/A", inline=False)
-        ch = bot.get_channel(TRACK_CHANNEL_ID)
-        if ch:
-            await ch.send(embed=embed)
+        embed.add_field(name="Changes (raw)", value=str(changes) if changes else "N/A", inline=False)
+        publisher.publish(embed=embed)
         # log
-        data = load_data()
-        data["logs"].setdefault("role_update", []).append({
+        store.append(["logs", "role_update"], {
             "role_id": after.id,
             "before_name": before.name,
             "after_name": after.name,
@@ -796,7 +3309,6 @@ async def on_guild_role_update(before: discord.Role, after: discord.Role):
             "editor": actor.id if actor else None,
             "time": format_time(datetime.datetime.utcnow())
         })
-        save_data(data)
     except Exception as e:
         safe_print("⚠️ on_guild_role_update error:", e)
         traceback.print_exc()
@@ -805,40 +3317,427 @@ async def on_guild_role_update(before: discord.Role, after: discord.Role):
 async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
     try:
         guild = after.guild
-        actor = None
-        try:
-            async for entry in guild.audit_logs(limit=6, action=discord.AuditLogAction.channel_update):
-                # attribute for channel update
-                if getattr(entry.target, "id", None) == after.id:
-                    actor = entry.user
-                    changes = entry.changes
-                    break
-        except Exception as e:
-            safe_print("⚠️ channel_update audit lookup failed:", e)
-            changes = None
+        entry = await audit_cache.attribute(discord.AuditLogAction.channel_update, after.id)
+        actor = audit_actor(entry, guild)
+        changes = entry.changes if entry else None
         embed = discord.Embed(title="🔧 Channel Updated", color=discord.Color.blurple())
         embed.add_field(name="Channel", value=f"{after.name} ({after.id})", inline=False)
         embed.add_field(name="Edited by", value=f"{actor} ({actor.id})" if actor else "Unknown", inline=False)
         embed.add_field(name="Before", value=f"{before.name}", inline=True)
         embed.add_field(name="After", value=f"{after.name}", inline=True)
-        embed.add_field(name="Raw changes", value=str(getattr(locals().get('changes', {}), '__str__', lambda: '{}')()) or "N/A", inline=False)
-        ch = bot.get_channel(TRACK_CHANNEL_ID)
-        if ch:
-            await ch.send(embed=embed)
+        embed.add_field(name="Raw changes", value=str(changes) if changes else "N/A", inline=False)
+        publisher.publish(embed=embed)
         # log
-        data = load_data()
-        data["logs"].setdefault("channel_update", []).append({
+        store.append(["logs", "channel_update"], {
             "channel_id": after.id,
             "before_name": before.name,
             "after_name": after.name,
             "editor": actor.id if actor else None,
             "time": format_time(datetime.datetime.utcnow())
         })
-        save_data(data)
     except Exception as e:
         safe_print("⚠️ on_guild_channel_update error:", e)
         traceback.print_exc()
 
+# ------------------ MUTE RECORDS ------------------
+# data["mutes"] is indexed by user id:
+#   {"<user_id>": {"active": [record, ...], "history": [record, ...]}}
+# Active records are kept in start order, so a user's newest mute is active[-1]. Every
+# record carries its own "mute_id"; ended records move to history with ended_utc/ended_by.
+def mutes_are_indexed(mutes: Dict[str, Any]) -> bool:
+    return all(isinstance(v, dict) and "active" in v for v in mutes.values())
+
+def index_mute_records(flat: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Convert the old {mute_id: record} layout; every stored record there was still active."""
+    indexed: Dict[str, Dict[str, Any]] = {}
+    for mute_id, m in sorted(flat.items(), key=lambda kv: mute_deadline(kv[1]) - kv[1].get("duration_seconds", 0)):
+        entry = indexed.setdefault(str(m.get("user")), {"active": [], "history": []})
+        entry["active"].append(dict(m, mute_id=mute_id))
+    return indexed
+
+def active_mute(user_id: int) -> Optional[Dict[str, Any]]:
+    active = store.data["mutes"].get(str(user_id), {}).get("active")
+    return active[-1] if active else None
+
+def add_mute_op(user_id: int, record: Dict[str, Any]) -> List[Any]:
+    return ["append", ["mutes", str(user_id), "active"], record]
+
+def drop_mute_op(user_id: int, mute_id: str) -> List[Any]:
+    """Op removing an active record that never took effect (the role add failed)."""
+    entry = store.data["mutes"].get(str(user_id), {})
+    active = [m for m in entry.get("active", []) if m.get("mute_id") != mute_id]
+    if not active and not entry.get("history"):
+        return ["del", ["mutes", str(user_id)], None]
+    return ["set", ["mutes", str(user_id), "active"], active]
+
+def end_mute_ops(user_id: int, mute_id: Optional[str] = None, ended_by: Optional[int] = None) -> List[List[Any]]:
+    """Ops moving one active mute (or all of them when mute_id is None) into history."""
+    uid = str(user_id)
+    active = store.data["mutes"].get(uid, {}).get("active", [])
+    ending = [m for m in active if mute_id is None or m.get("mute_id") == mute_id]
+    if not ending:
+        return []
+    ops = [["set", ["mutes", uid, "active"], [m for m in active if m not in ending]]]
+    ended_utc = format_time(datetime.datetime.utcnow())
+    for m in ending:
+        ops.append(["append", ["mutes", uid, "history"], dict(m, ended_utc=ended_utc, ended_by=ended_by)])
+    return ops
+
+# ------------------ MUTE SCHEDULER ------------------
+def mute_deadline(m: Dict[str, Any]) -> float:
+    """Epoch seconds at which a stored mute expires (older records only carry unmute_utc)."""
+    if m.get("unmute_ts"):
+        return m["unmute_ts"]
+    try:
+        return datetime.datetime.strptime(m["unmute_utc"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=datetime.timezone.utc).timestamp()
+    except Exception:
+        return time.time()
+
+class MuteScheduler:
+    """
+    One task for every pending auto-unmute. Deadlines live in a min-heap ordered by unmute
+    time and the task sleeps only until the earliest one (or until an earlier one is
+    scheduled). Rebuilt from the stored mutes at startup, so timers survive restarts and
+    anything that expired while the bot was down is processed immediately.
+    """
+
+    def __init__(self):
+        self.heap: List[tuple] = []          # (unmute_ts, mute_id, user_id)
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def rebuild(self) -> None:
+        self.heap = [(mute_deadline(m), m["mute_id"], int(uid))
+                     for uid, entry in store.data.get("mutes", {}).items()
+                     for m in entry.get("active", []) if m.get("auto")]
+        heapq.heapify(self.heap)
+
+    def schedule(self, mute_id: str, user_id: int, unmute_ts: float) -> None:
+        heapq.heappush(self.heap, (unmute_ts, mute_id, user_id))
+        if self.heap[0][1] == mute_id:
+            self.wakeup.set()
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.rebuild()
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+            delay = self.heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, mute_id, user_id = heapq.heappop(self.heap)
+            try:
+                await expire_mute(mute_id, user_id)
+            except Exception as e:
+                safe_print("❌ auto-unmute error:", e)
+                traceback.print_exc()
+
+async def expire_mute(mute_id: str, user_id: int) -> None:
+    if not end_mute_ops(user_id, mute_id):
+        # already lifted by hand (on_member_update ended the record)
+        return
+    active = store.data["mutes"].get(str(user_id), {}).get("active", [])
+    if any(m.get("mute_id") != mute_id for m in active):
+        # a longer mute is still running; keep the role
+        store.apply(*end_mute_ops(user_id, mute_id))
+        return
+    g = bot.get_guild(GUILD_ID)
+    if not g:
+        mute_scheduler.schedule(mute_id, user_id, time.time() + MUTE_RETRY_DELAY)
+        return
+    # muted users are usually not cached (LAZY_MEMBER_CHUNKING), so ask the API
+    member = g.get_member(user_id)
+    if member is None:
+        try:
+            member = await g.fetch_member(user_id)
+        except discord.NotFound:
+            member = None
+        except discord.HTTPException as e:
+            safe_print(f"⚠️ auto-unmute: could not fetch {user_id}, retrying:", e)
+            mute_scheduler.schedule(mute_id, user_id, time.time() + MUTE_RETRY_DELAY)
+            return
+    r = g.get_role(RMUTE_ROLE_ID)
+    if member is not None and r in member.roles:
+        try:
+            await member.remove_roles(r, reason="Auto-unmute")
+        except discord.HTTPException as e:
+            safe_print(f"⚠️ auto-unmute: could not remove role from {user_id}, retrying:", e)
+            mute_scheduler.schedule(mute_id, user_id, time.time() + MUTE_RETRY_DELAY)
+            return
+        publisher.publish(embed=build_unmute_log_embed(member, None, None, auto=True))
+    # role removed, already gone, or the user left the guild: end the record
+    ops = end_mute_ops(user_id, mute_id)
+    if ops:
+        store.apply(*ops)
+
+mute_scheduler = MuteScheduler()
+
+# ------------------ PAGED VIEWS ------------------
+def parse_view_filters(ctx: commands.Context, args: tuple) -> Dict[str, Any]:
+    """!rcache / !rpurge filters: @author, #channel, and `bulk` or `single`."""
+    words = {a.lower() for a in args}
+    return {
+        "author": ctx.message.mentions[0].id if ctx.message.mentions else None,
+        "channel": ctx.message.channel_mentions[0].id if ctx.message.channel_mentions else None,
+        "bulk": True if "bulk" in words else False if "single" in words else None
+    }
+
+def describe_filters(filters: Dict[str, Any]) -> str:
+    parts = []
+    if filters.get("author") is not None:
+        parts.append(f"author <@{filters['author']}>")
+    if filters.get("channel") is not None:
+        parts.append(f"channel <#{filters['channel']}>")
+    if filters.get("bulk") is not None:
+        parts.append("bulk deletions" if filters["bulk"] else "single deletions")
+    return "Filters: " + ", ".join(parts) if parts else "No filters (newest first)."
+
+class PagedView(discord.ui.View):
+    """
+    Prev/Next buttons over a query that returns one page at a time: `fetch(offset, limit)`
+    -> (total, items) and `render(items)` -> Embed. Each press loads only that page.
+    `attach(items)`, if given, returns (path, filename) files uploaded with the page.
+    Only the member who ran the command can turn pages.
+    """
+
+    def __init__(self, owner_id: int, fetch, render, per_page: int, attach=None):
+        super().__init__(timeout=PAGE_VIEW_TIMEOUT)
+        self.owner_id = owner_id
+        self.fetch = fetch
+        self.render = render
+        self.attach = attach
+        self.per_page = per_page
+        self.page = 0
+        self.upload: List[tuple] = []
+        self.message: Optional[discord.Message] = None
+
+    async def build(self) -> discord.Embed:
+        total, items = await self.fetch(self.page * self.per_page, self.per_page)
+        pages = max((total + self.per_page - 1) // self.per_page, 1)
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = self.page >= pages - 1
+        embed = self.render(items)
+        embed.set_footer(text=f"Page {self.page + 1}/{pages} • {total} entries")
+        self.upload = self.attach(items) if self.attach else []
+        return embed
+
+    async def show(self, interaction: discord.Interaction) -> None:
+        embed = await self.build()
+        if not self.upload and not self.attach:
+            await interaction.response.edit_message(embed=embed, view=self)
+            return
+        # uploads can outlast the interaction deadline, so acknowledge first
+        await interaction.response.defer()
+        await interaction.edit_original_response(embed=embed, attachments=open_files(self.upload), view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("❌ Only the member who ran the command can turn pages.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show(interaction)
+
+    async def on_timeout(self) -> None:
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except:
+                pass
+
+async def send_paged(ctx: commands.Context, fetch, render, per_page: int, attach=None) -> None:
+    view = PagedView(ctx.author.id, fetch, render, per_page, attach)
+    embed = await view.build()
+    view.message = await ctx.send(embed=embed, view=view, files=open_files(view.upload))
+
+# ------------------ LEADERBOARD ENGINE ------------------
+LEADERBOARD_WINDOWS = {
+    "today": "Today",
+    "7d": "Last 7 days",
+    "30d": "Last 30 days",
+    "month": "This month",
+    "all": "All time"
+}
+
+class LeaderboardEngine:
+    """
+    Rankings of tracked members for !tlb. The last LEADERBOARD_DAYS days of activity for
+    every tracked member sit in one matrix (numpy, when installed) plus an all-time
+    vector; add_seconds_to_user credits both in place. A window's ranking is a vectorized
+    column sum + argsort, cached until something is credited (and then at most once per
+    LEADERBOARD_REFRESH seconds), so a page is just a slice of the cached list.
+    """
+
+    def __init__(self):
+        self.uids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.base_day = 0                # day number of matrix column 0
+        self.matrix = None
+        self.totals = None
+        self.stale = True
+        self.version = 0
+        self.cache: Dict[str, tuple] = {}    # window -> (version, built_at, [(uid, seconds), ...])
+
+    def invalidate(self) -> None:
+        """Tracked membership changed; rebuild on the next query."""
+        self.stale = True
+
+    def credit(self, uid: str, day: int, seconds: int) -> None:
+        i = self.index.get(uid)
+        if i is None or self.stale:
+            return
+        col = day - self.base_day
+        if self.matrix is not None and 0 <= col < LEADERBOARD_DAYS:
+            self.matrix[i, col] += seconds
+        self.totals[i] += seconds
+        self.version += 1
+
+    def _rebuild(self, today: int) -> None:
+        self.uids = sorted(str(mid) for mid in tracked_member_ids)
+        self.index = {uid: i for i, uid in enumerate(self.uids)}
+        self.base_day = today - LEADERBOARD_DAYS + 1
+        users = store.data["users"]
+        totals = [users.get(uid, {}).get("total_online_seconds", 0) for uid in self.uids]
+        if numpy is not None:
+            self.totals = numpy.array(totals, dtype=numpy.int64)
+            self.matrix = numpy.zeros((len(self.uids), LEADERBOARD_DAYS), dtype=numpy.uint32)
+            rows = store.data["activity"]
+            for i, uid in enumerate(self.uids):
+                row = rows.get(uid)
+                if row is None:
+                    continue
+                a = max(self.base_day - row.start, 0)
+                b = min(today - row.start + 1, len(row.seconds))
+                if a < b:
+                    col = row.start + a - self.base_day
+                    self.matrix[i, col:col + b - a] = row.view()[a:b]
+        else:
+            self.totals, self.matrix = totals, None
+        self.stale = False
+        self.version += 1
+        self.cache = {}
+
+    def _window_totals(self, window: str, today: int):
+        if window == "all":
+            return self.totals
+        if window == "month":
+            first = day_number(datetime.date.fromordinal(today + EPOCH_ORDINAL).replace(day=1))
+        else:
+            first = today - {"today": 0, "7d": 6, "30d": 29}[window]
+        if self.matrix is not None:
+            return self.matrix[:, first - self.base_day:].sum(axis=1, dtype=numpy.int64)
+        rows = store.data["activity"]
+        return [rows[uid].sum_range(first, today) if uid in rows else 0 for uid in self.uids]
+
+    def ranking(self, window: str) -> List[tuple]:
+        """[(uid, seconds), ...] best first, members with no time in the window left out."""
+        now = time.time()
+        today = day_number(datetime.datetime.utcnow())
+        if self.stale or self.base_day != today - LEADERBOARD_DAYS + 1:
+            self._rebuild(today)
+        cached = self.cache.get(window)
+        if cached and (cached[0] == self.version or now - cached[1] < LEADERBOARD_REFRESH):
+            return cached[2]
+        totals = self._window_totals(window, today)
+        if numpy is not None:
+            order = numpy.argsort(-numpy.asarray(totals, dtype=numpy.int64), kind="stable")
+            ranked = [(self.uids[i], int(totals[i])) for i in order.tolist() if totals[i] > 0]
+        else:
+            ranked = sorted(((uid, t) for uid, t in zip(self.uids, totals) if t > 0), key=lambda kv: -kv[1])
+        self.cache[window] = (self.version, now, ranked)
+        return ranked
+
+    def page(self, window: str, page: int, per_page: int = LEADERBOARD_PAGE_SIZE) -> tuple:
+        """(entries [(rank, uid, seconds)], page, pages) for a 1-based page number."""
+        ranked = self.ranking(window)
+        pages = max((len(ranked) + per_page - 1) // per_page, 1)
+        page = min(max(page, 1), pages)
+        start = (page - 1) * per_page
+        return [(start + n + 1, uid, sec) for n, (uid, sec) in enumerate(ranked[start:start + per_page])], page, pages
+
+leaderboard = LeaderboardEngine()
+
+RMUTE_WINDOWS = {"all": ("All time", None), "30d": ("Last 30 days", 30), "7d": ("Last 7 days", 7)}
+
+def rmute_usage_ops(moderator_id: int, count: int) -> List[List[Any]]:
+    """All-time counter plus the per-day bucket the windowed rankings are built from."""
+    uid = str(moderator_id)
+    return [
+        ["incr", ["rmute_usage", uid], count],
+        ["tally", ["rmute_activity", uid], [day_number(datetime.datetime.utcnow()), count]]
+    ]
+
+class RmuteLeaderboard:
+    """
+    !rmlb rankings per window, each a sorted list of (-count, uid) kept in step with the
+    counters: a mute moves one entry (bisect), a read is a slice. The 7d/30d windows are
+    re-derived from rmute_activity once per day, when days fall out of them.
+    """
+
+    def __init__(self):
+        self.day: Optional[int] = None
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.order: Dict[str, List[tuple]] = {}
+
+    def _rebuild(self, today: int) -> None:
+        self.day = today
+        rows = store.data.get("rmute_activity", {})
+        for window, (_, days) in RMUTE_WINDOWS.items():
+            if days is None:
+                counts = {uid: n for uid, n in store.data.get("rmute_usage", {}).items() if n > 0}
+            else:
+                counts = {uid: row.sum_range(today - days + 1, today) for uid, row in rows.items()}
+                counts = {uid: n for uid, n in counts.items() if n > 0}
+            self.counts[window] = counts
+            self.order[window] = sorted((-n, uid) for uid, n in counts.items())
+
+    def _current(self) -> bool:
+        """Rebuild when the day changed; True if it did."""
+        today = day_number(datetime.datetime.utcnow())
+        if self.day != today:
+            self._rebuild(today)
+            return True
+        return False
+
+    def record(self, uid: str, count: int) -> None:
+        """Call after rmute_usage_ops() were applied."""
+        if self._current():
+            # the rebuild read the counters, which already include these mutes
+            return
+        for window in RMUTE_WINDOWS:
+            counts, order = self.counts[window], self.order[window]
+            old = counts.get(uid, 0)
+            if old:
+                del order[bisect.bisect_left(order, (-old, uid))]
+            counts[uid] = old + count
+            bisect.insort(order, (-(old + count), uid))
+
+    def top(self, window: str, limit: int = 10) -> List[tuple]:
+        self._current()
+        return [(uid, -neg) for neg, uid in self.order[window][:limit]]
+
+rmute_board = RmuteLeaderboard()
+
 # ------------------ COMMANDS: rmute/runmute/rmlb/rcache/tlb/rhelp/timetrack/tt/rping ------------------
 @bot.command(name="rmute", help="Mute users: !rmute @u1 @u2 <duration> [reason]")
 @commands.has_permissions(manage_roles=True)
@@ -853,70 +3752,68 @@ async def cmd_rmute(ctx: commands.Context, targets: commands.Greedy[discord.Memb
     if not targets:
         await ctx.send("❌ Mention at least one user.")
         return
-    data = load_data()
-    ch = bot.get_channel(TRACK_CHANNEL_ID)
+    role = ctx.guild.get_role(RMUTE_ROLE_ID)
+    if role is None:
+        await ctx.send("⚠️ RMUTE role not configured on this server.")
+        return
     try:
         await ctx.message.delete()
     except:
         pass
+    targets = list({t.id: t for t in targets}.values())
+    now = datetime.datetime.utcnow()
+    unmute_at = now + datetime.timedelta(seconds=seconds)
+    unmute_ts = int(time.time()) + seconds
+    records = {}
     for target in targets:
-        try:
-            role = ctx.guild.get_role(RMUTE_ROLE_ID)
-            if role is None:
-                await ctx.send("⚠️ RMUTE role not configured on this server.")
-                return
-            # apply mute role
-            await target.add_roles(role, reason=f"rmute by {ctx.author} reason: {reason}")
-            mute_id = f"rmute_{target.id}_{int(datetime.datetime.utcnow().timestamp())}"
-            unmute_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)
-            data["mutes"][mute_id] = {
-                "user": target.id,
-                "moderator": ctx.author.id,
-                "reason": reason,
-                "duration_seconds": seconds,
-                "start_utc": format_time(datetime.datetime.utcnow()),
-                "unmute_utc": format_time(unmute_at),
-                "auto": True
-            }
-            # increment usage
-            data["rmute_usage"][str(ctx.author.id)] = data.get("rmute_usage", {}).get(str(ctx.author.id), 0) + 1
-            save_data(data)
+        records[target.id] = {
+            "mute_id": f"rmute_{target.id}_{int(now.timestamp())}",
+            "user": target.id,
+            "moderator": ctx.author.id,
+            "reason": reason,
+            "duration_seconds": seconds,
+            "start_utc": format_time(now),
+            "unmute_utc": format_time(unmute_at),
+            "unmute_ts": unmute_ts,
+            "auto": True
+        }
+    # record every mute before the roles go on, so on_member_update sees them as ours
+    store.apply(*(add_mute_op(uid, record) for uid, record in records.items()))
+    # apply roles and DM everyone concurrently (bounded)
+    limiter = asyncio.Semaphore(RMUTE_CONCURRENCY)
+
+    async def mute_one(target: discord.Member) -> tuple:
+        async with limiter:
+            try:
+                await target.add_roles(role, reason=f"rmute by {ctx.author} reason: {reason}")
+            except Exception as e:
+                return target, False, str(e)
             # DM the muted user with a cooler embed
             try:
-                dm = build_mute_dm_embed(target, ctx.author, duration, reason, auto=False)
-                await target.send(embed=dm)
+                await target.send(embed=build_mute_dm_embed(target, ctx.author, duration, reason, auto=False))
+                return target, True, None
             except:
-                pass
-            # log to track channel
-            if ch:
-                await ch.send(embed=build_mute_log_embed(target, ctx.author, duration, reason, format_time(unmute_at), source=f"{ctx.author}"))
-            # schedule unmute
-            async def auto_unmute(mute_record_id: str, user_id: int, seconds_left: int):
-                await asyncio.sleep(seconds_left)
-                g = bot.get_guild(GUILD_ID)
-                if not g:
-                    return
-                member = g.get_member(user_id)
-                if member:
-                    r = g.get_role(RMUTE_ROLE_ID)
-                    if r in member.roles:
-                        try:
-                            await member.remove_roles(r, reason="Auto-unmute")
-                        except:
-                            pass
-                        # remove record
-                        d2 = load_data()
-                        if mute_record_id in d2.get("mutes", {}):
-                            d2["mutes"].pop(mute_record_id, None)
-                            save_data(d2)
-                        c = bot.get_channel(TRACK_CHANNEL_ID)
-                        if c:
-                            await c.send(embed=build_unmute_log_embed(member, None, None, auto=True))
-            bot.loop.create_task(auto_unmute(mute_id, target.id, seconds))
-        except Exception as e:
-            safe_print("❌ Error applying rmute:", e)
-            traceback.print_exc()
-    save_data(data)
+                return target, True, "DMs closed"
+
+    results = await asyncio.gather(*(mute_one(t) for t in targets))
+    muted = [t for t, ok, _ in results if ok]
+    failed = [drop_mute_op(t.id, records[t.id]["mute_id"]) for t, ok, _ in results if not ok]
+    if failed:
+        store.apply(*failed)
+    if muted:
+        store.apply(*rmute_usage_ops(ctx.author.id, len(muted)))
+        rmute_board.record(str(ctx.author.id), len(muted))
+        # the records must be on disk before the moderator is told the mutes took effect
+        durable = store.durable()
+        for target in muted:
+            mute_scheduler.schedule(records[target.id]["mute_id"], target.id, unmute_ts)
+        # log to track channel
+        if len(muted) == 1:
+            publisher.publish(embed=build_mute_log_embed(muted[0], ctx.author, duration, reason, format_time(unmute_at), source=f"{ctx.author}"))
+        else:
+            publisher.publish(embed=build_bulk_mute_log_embed(muted, ctx.author, duration, reason, format_time(unmute_at)))
+        await durable
+    await ctx.send(embed=build_bulk_mute_report_embed(results, duration))
 
 @bot.command(name="runmute", help="Runmute a user (logs and auto-unmute).")
 @commands.has_permissions(manage_roles=True)
@@ -928,7 +3825,6 @@ async def cmd_runmute(ctx: commands.Context, target: discord.Member, duration: s
     if seconds is None:
         await ctx.send("❌ Invalid duration.")
         return
-    data = load_data()
     try:
         role = ctx.guild.get_role(RMUTE_ROLE_ID)
         if role is None:
@@ -937,88 +3833,88 @@ async def cmd_runmute(ctx: commands.Context, target: discord.Member, duration: s
         await target.add_roles(role, reason=f"runmute by {ctx.author}")
         mute_id = f"runmute_{target.id}_{int(datetime.datetime.utcnow().timestamp())}"
         unmute_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)
-        data["mutes"][mute_id] = {
+        unmute_ts = int(time.time()) + seconds
+        store.apply(add_mute_op(target.id, {
+            "mute_id": mute_id,
             "user": target.id,
             "moderator": ctx.author.id,
             "reason": reason,
             "duration_seconds": seconds,
             "start_utc": format_time(datetime.datetime.utcnow()),
             "unmute_utc": format_time(unmute_at),
+            "unmute_ts": unmute_ts,
             "auto": True
-        }
-        save_data(data)
-        if bot.get_channel(TRACK_CHANNEL_ID):
-            await bot.get_channel(TRACK_CHANNEL_ID).send(embed=build_mute_log_embed(target, ctx.author, duration, reason, format_time(unmute_at)))
+        }))
+        publisher.publish(embed=build_mute_log_embed(target, ctx.author, duration, reason, format_time(unmute_at)))
         # schedule unmute same as rmute
-        async def runmute_unmute(mute_record_id: str, user_id: int, seconds_left: int):
-            await asyncio.sleep(seconds_left)
-            g = bot.get_guild(GUILD_ID)
-            if not g:
-                return
-            member = g.get_member(user_id)
-            if member:
-                role_inner = g.get_role(RMUTE_ROLE_ID)
-                try:
-                    if role_inner in member.roles:
-                        await member.remove_roles(role_inner, reason="Auto-unmute runmute")
-                except:
-                    pass
-                dlocal = load_data()
-                dlocal.get("mutes", {}).pop(mute_record_id, None)
-                save_data(dlocal)
-                c = bot.get_channel(TRACK_CHANNEL_ID)
-                if c:
-                    await c.send(embed=build_unmute_log_embed(member, None, None, auto=True))
-        bot.loop.create_task(runmute_unmute(mute_id, target.id, seconds))
+        mute_scheduler.schedule(mute_id, target.id, unmute_ts)
     except Exception as e:
         safe_print("❌ runmute error:", e)
         traceback.print_exc()
 
-@bot.command(name="rmlb", help="Show top rmute users leaderboard")
-async def cmd_rmlb(ctx: commands.Context):
-    data = load_data()
-    usage = data.get("rmute_usage", {})
-    sorted_usage = sorted(usage.items(), key=lambda kv: kv[1], reverse=True)[:10]
-    embed = discord.Embed(title="🏆 RMute Leaderboard", color=discord.Color.gold())
-    for uid, cnt in sorted_usage:
-        member = ctx.guild.get_member(int(uid))
-        name = member.display_name if member else f"User ID {uid}"
+@bot.command(name="rmlb", help="Show top rmute users leaderboard: !rmlb [all|30d|7d]")
+async def cmd_rmlb(ctx: commands.Context, window: str = "all"):
+    window = window.lower()
+    if window not in RMUTE_WINDOWS:
+        await ctx.send(f"❌ Usage: !rmlb [{'|'.join(RMUTE_WINDOWS)}]")
+        return
+    embed = discord.Embed(title=f"🏆 RMute Leaderboard — {RMUTE_WINDOWS[window][0]}", color=discord.Color.gold())
+    top = rmute_board.top(window, 10)
+    names = await member_names(ctx.guild, [int(uid) for uid, _ in top])
+    for uid, cnt in top:
+        name = names.get(int(uid), f"User ID {uid}")
         embed.add_field(name=name, value=f"Mutes used: {cnt}", inline=False)
     await ctx.send(embed=embed)
 
-@bot.command(name="rcache", help="Show cached deleted images/files (role gated)")
-async def cmd_rcache(ctx: commands.Context):
+@bot.command(name="rcache", help="Show cached deleted images/files (role gated): !rcache [@author] [#channel] [bulk|single]")
+async def cmd_rcache(ctx: commands.Context, *args: str):
     # check roles
     if not any(r.id in RCACHE_ROLES for r in ctx.author.roles):
         await ctx.send("❌ You do not have permission to view cache.")
         return
-    data = load_data()
-    images = data.get("images", {})
-    embed = discord.Embed(title="🗂️ Deleted Images/Files Cache", color=discord.Color.purple())
-    count = 0
-    for mid, info in list(images.items())[:40]:
-        author = ctx.guild.get_member(info.get("author")) if info.get("author") else None
-        author_str = author.display_name if author else str(info.get("author"))
-        attachments = info.get("attachments", [])
-        attachments_txt = "\n".join(attachments) if attachments else "None"
-        content = (info.get("content") or "")[:500]
-        deleted_by = info.get("deleted_by")
-        embed.add_field(name=f"Msg {mid} by {author_str}", value=f"Time: {info.get('time')}\nDeleted by: {deleted_by}\nAttachments:\n{attachments_txt}\nContent: {content}", inline=False)
-        count += 1
-    if count == 0:
-        embed.description = "No cached deleted images/files."
-    await ctx.send(embed=embed)
-
-@bot.command(name="tlb", help="Timetrack leaderboard")
-async def cmd_tlb(ctx: commands.Context):
-    data = load_data()
-    users = data.get("users", {})
-    top = sorted(users.items(), key=lambda kv: kv[1].get("total_online_seconds", 0), reverse=True)[:15]
-    embed = discord.Embed(title="📊 Timetrack Leaderboard", color=discord.Color.green())
-    for uid, ud in top:
-        member = ctx.guild.get_member(int(uid))
-        name = member.display_name if member else f"User ID {uid}"
-        embed.add_field(name=name, value=f"Total Online: {format_duration_seconds(ud.get('total_online_seconds', 0))}", inline=False)
+    filters = parse_view_filters(ctx, args)
+
+    def render(items: List[tuple]) -> discord.Embed:
+        embed = discord.Embed(title="🗂️ Deleted Images/Files Cache", color=discord.Color.purple(), description=describe_filters(filters))
+        for mid, info in items:
+            author = ctx.guild.get_member(info.get("author")) if info.get("author") else None
+            author_str = author.display_name if author else str(info.get("author"))
+            urls = info.get("attachments", [])
+            attachments_txt = "\n".join(urls) if urls else "None"
+            content = (info.get("content") or "")[:300]
+            deleted_by = info.get("deleted_by")
+            archived = len(archived_files(mid, info))
+            value = f"Time: {info.get('time')}\nDeleted by: {deleted_by}\nAttachments:\n{attachments_txt}\nArchived copies: {archived}\nContent: {content}"
+            embed.add_field(name=f"Msg {mid} by {author_str}"[:256], value=value[:1000], inline=False)
+        if not items:
+            embed.add_field(name="Empty", value="No cached deleted images/files.", inline=False)
+        return embed
+
+    def attach(items: List[tuple]) -> List[tuple]:
+        files = [f for mid, info in items for f in archived_files(mid, info)]
+        return attachments.upload_set(files, ctx.guild.filesize_limit)
+
+    await send_paged(ctx, lambda offset, limit: store.page_images(filters, offset, limit), render, PAGE_VIEW_SIZE, attach)
+
+@bot.command(name="tlb", help="Timetrack leaderboard: !tlb [today|7d|30d|month|all] [page]")
+async def cmd_tlb(ctx: commands.Context, window: str = "all", page: str = "1"):
+    if window.isdigit():
+        # !tlb 2 -> all-time, page 2
+        window, page = "all", window
+    window = window.lower()
+    if window not in LEADERBOARD_WINDOWS or not page.isdigit():
+        await ctx.send(f"❌ Usage: !tlb [{'|'.join(LEADERBOARD_WINDOWS)}] [page]")
+        return
+    entries, page_no, pages = leaderboard.page(window, int(page))
+    label = LEADERBOARD_WINDOWS[window]
+    embed = discord.Embed(title=f"📊 Timetrack Leaderboard — {label}", color=discord.Color.green())
+    if not entries:
+        embed.description = "No tracked activity in this window yet."
+    names = await member_names(ctx.guild, [int(uid) for _, uid, _ in entries])
+    for rank, uid, total in entries:
+        name = names.get(int(uid), f"User ID {uid}")
+        embed.add_field(name=f"#{rank} {name}", value=f"{label}: {format_duration_seconds(total)}", inline=False)
+    embed.set_footer(text=f"Page {page_no}/{pages} • !tlb {window} {min(page_no + 1, pages)}")
     await ctx.send(embed=embed)
 
 @bot.command(name="rhelp", help="Show commands")
@@ -1027,19 +3923,19 @@ async def cmd_rhelp(ctx: commands.Context):
     embed.add_field(name="!timetrack [user]", value="Show timetrack info.", inline=False)
     embed.add_field(name="!rmute @u1 @u2 <duration> [reason]", value="Mute user(s).", inline=False)
     embed.add_field(name="!runmute @u <duration> [reason]", value="Runmute + auto unmute.", inline=False)
-    embed.add_field(name="!rmlb", value="Top mute-invokers.", inline=False)
-    embed.add_field(name="!rcache", value="Show deleted images/files (roles only).", inline=False)
-    embed.add_field(name="!tlb", value="Timetrack leaderboard.", inline=False)
+    embed.add_field(name="!rmlb [all|30d|7d]", value="Top mute-invokers.", inline=False)
+    embed.add_field(name="!rcache [@author] [#channel] [bulk|single]", value="Show deleted images/files (roles only).", inline=False)
+    embed.add_field(name="!tlb [today|7d|30d|month|all] [page]", value="Timetrack leaderboard.", inline=False)
     embed.add_field(name="!rping", value="Toggle ping replacement for your mentions (no ping if turned off).", inline=False)
+    embed.add_field(name="!rstats", value="Queue and throughput stats (admins).", inline=False)
     await ctx.send(embed=embed)
 
 @bot.command(name="timetrack", help="Show timetrack for a user.")
 async def cmd_timetrack(ctx: commands.Context, member: Optional[discord.Member] = None):
     member = member or ctx.author
-    data = load_data()
     uid = str(member.id)
-    ensure_user_data(uid, data)
-    embed = build_timetrack_embed(member, data["users"][uid])
+    ingest.drain()
+    embed = build_timetrack_embed(member, ensure_user_data(uid))
     await ctx.send(embed=embed)
 
 @bot.command(name="tt", help="Alias for timetrack")
@@ -1049,78 +3945,148 @@ async def cmd_tt(ctx: commands.Context, member: Optional[discord.Member] = None)
 @bot.command(name="rping", help="Toggle whether the bot pings you (replaces mention with name when disabled).")
 async def cmd_rping(ctx: commands.Context):
     # toggle per-user
-    data = load_data()
+    data = store.data
     uid = str(ctx.author.id)
     disabled = data.get("rping_disabled_users", {}).get(uid, False)
-    data.setdefault("rping_disabled_users", {})[uid] = not disabled
-    save_data(data)
+    store.set(["rping_disabled_users", uid], not disabled)
     status = "disabled" if not disabled else "enabled"
     await ctx.send(f"🔔 rping is now **{status}** for you. (When disabled, bot will not ping you; it will show your name instead.)")
 
-# ------------------ ADMIN: rpurge check (attempt attribution) ------------------
-@bot.command(name="rpurge", help="(Admin) Check recent cached bulk deletions and possible actors.")
+# ------------------ ADMIN: rstats ------------------
+@bot.command(name="rstats", help="(Admin) Show internal queue/throughput stats.")
 @commands.has_permissions(manage_messages=True)
-async def cmd_rpurge(ctx: commands.Context):
-    data = load_data()
-    deletions = data.get("logs", {}).get("deletions", [])[-70:]
-    embed = discord.Embed(title="🧾 Recent Cached Deletions", color=discord.Color.dark_red())
-    if not deletions:
-        embed.description = "No cached deletions stored."
-        await ctx.send(embed=embed)
-        return
-    for d in deletions[-15:]:
-        content = (d.get("content") or "")[:200]
-        embed.add_field(name=f"Msg {d.get('message_id')} by {d.get('author')}", value=f"{content}\nTime: {d.get('time')}", inline=False)
+async def cmd_rstats(ctx: commands.Context):
+    embed = discord.Embed(title="📈 RStats", color=discord.Color.blue())
+    p = publisher.stats()
+    embed.add_field(name="Track channel queue", value=(
+        f"Depth: {p['depth']}\nDropped: {p['dropped']}\n"
+        f"Sent: {p['sent_items']} items in {p['sent_messages']} messages\nRate limited: {p['rate_limited']}"
+    ), inline=False)
+    i = ingest.stats()
+    embed.add_field(name="Ingestion", value=(
+        f"Events/sec: {i['rate']:.1f} (last {INGEST_RATE_WINDOW}s)\nQueue: {i['depth']} (lag {i['lag'] * 1000:.0f} ms, "
+        f"last batch {i['last_lag'] * 1000:.0f} ms)\nReceived: {i['received']} in {i['batches']} batches\nDropped: {i['dropped']}"
+    ), inline=False)
+    total = time.monotonic() - startup_started
+    phases = [f"{k}: {v:.1f}s" for k, v in startup_phases.items()]
+    embed.add_field(name="Startup", value="\n".join(phases) or f"In progress ({total:.0f}s)", inline=False)
+    a = attachments.stats()
+    embed.add_field(name="Attachment archive", value=(
+        f"Files: {a['blobs']} ({a['bytes'] / 1048576:.1f} / {ATTACHMENT_QUOTA / 1048576:.0f} MiB)\nQueued: {a['queued']}\n"
+        f"Stored: {a['stored']} • Deduplicated: {a['deduped']}\nSkipped (too large): {a['skipped']} • Dropped: {a['dropped']} • Failed: {a['failed']}"
+    ), inline=False)
+    c = message_cache.stats()
+    embed.add_field(name="Message cache", value=(
+        f"Entries: {c['entries']}\nSize: {c['bytes'] / 1048576:.1f} / {MESSAGE_CACHE_BYTES / 1048576:.0f} MiB\n"
+        f"Hit rate: {c['hit_rate']:.0%}\nEvicted: {c['evicted']}"
+    ), inline=False)
     await ctx.send(embed=embed)
 
+# ------------------ ADMIN: rpurge check (attempt attribution) ------------------
+@bot.command(name="rpurge", help="(Admin) Check cached deletions and possible actors: !rpurge [@author] [#channel] [bulk|single]")
+@commands.has_permissions(manage_messages=True)
+async def cmd_rpurge(ctx: commands.Context, *args: str):
+    filters = parse_view_filters(ctx, args)
+
+    def render(deletions: List[Dict[str, Any]]) -> discord.Embed:
+        embed = discord.Embed(title="🧾 Recent Cached Deletions", color=discord.Color.dark_red(), description=describe_filters(filters))
+        for d in deletions:
+            content = (d.get("content") or "")[:300]
+            where = f" in <#{d.get('channel')}>" if d.get("channel") else ""
+            kind = " (bulk)" if d.get("bulk") else ""
+            embed.add_field(name=f"Msg {d.get('message_id')} by {d.get('author')}{kind}"[:256],
+                            value=f"{content}\nTime: {d.get('time')}{where}"[:1000], inline=False)
+        if not deletions:
+            embed.add_field(name="Empty", value="No cached deletions stored.", inline=False)
+        return embed
+
+    await send_paged(ctx, lambda offset, limit: store.page_log("deletions", filters, offset, limit), render, PAGE_VIEW_SIZE)
+
 # ------------------ DEBUG: rdump ------------------
-@bot.command(name="rdump", help="(Admin) Dump JSON data for debugging")
+@bot.command(name="rdump", help="(Admin) Export data as compressed JSON lines: !rdump [sections...] [from:YYYY-MM-DD] [to:YYYY-MM-DD] [gzip|zstd]")
 @commands.has_permissions(administrator=True)
-async def cmd_rdump(ctx: commands.Context):
-    d = load_data()
-    path = "rdump.json"
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(d, f, indent=2, default=str)
-    await ctx.send("📦 Data dump:", file=discord.File(path))
+async def cmd_rdump(ctx: commands.Context, *args: str):
     try:
-        os.remove(path)
-    except:
-        pass
+        sections, window, codec = parse_dump_args(args)
+    except ValueError as e:
+        await ctx.send(f"❌ {e}")
+        return
+    part_bytes = ctx.guild.filesize_limit if ctx.guild else EXPORT_PART_BYTES
+    stream = ExportStream(f"rdump_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')}", codec, part_bytes)
+    records = 0
+
+    async def upload(path: Optional[str]) -> None:
+        if not path:
+            return
+        try:
+            await ctx.send("📦 Data dump:", file=discord.File(path))
+        finally:
+            try:
+                await disk_writer.run(os.remove, path)
+            except:
+                pass
+
+    try:
+        await store.flush()
+        for section in sections:
+            async for batch in store.export_batches(section, window):
+                records += len(batch)
+                await upload(await disk_writer.run(stream.write, encode_export_batch(section, batch)))
+        await upload(await disk_writer.run(stream.finish))
+    except Exception as e:
+        safe_print("⚠️ rdump failed:", e)
+        traceback.print_exc()
+        await disk_writer.run(stream.abort)
+        await ctx.send(f"❌ Dump failed after {records} records: {e}")
+        return
+    span = f" from {window[0]} to {window[1]}" if window else ""
+    await ctx.send(f"✅ Dumped {records} records ({', '.join(sections)}{span}) in {stream.parts} {codec} part(s).")
 
 # ------------------ DAILY ARCHIVE / CLEANUP ------------------
 @tasks.loop(hours=24)
 async def daily_maintenance_task():
     try:
-        data = load_data()
-        # prune daily entries older than 120 days
-        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=120)
-        for uid, u in data.get("users", {}).items():
-            daily = u.get("daily_seconds", {})
-            keys_to_remove = []
-            for k in list(daily.keys()):
-                try:
-                    ddt = datetime.datetime.strptime(k, "%Y-%m-%d")
-                    if ddt < cutoff:
-                        keys_to_remove.append(k)
-                except:
-                    pass
-            for k in keys_to_remove:
-                daily.pop(k, None)
-        save_data(data)
+        data = store.data
+        # prune per-day activity older than ACTIVITY_RETENTION_DAYS
+        cutoff = day_number(datetime.datetime.utcnow()) - ACTIVITY_RETENTION_DAYS
+        for uid, row in list(data.get("activity", {}).items()):
+            if row.seconds and row.start < cutoff:
+                store.set(["activity", uid], row.trimmed(cutoff))
     except Exception as e:
         safe_print("⚠️ daily maintenance error:", e)
         traceback.print_exc()
 
 # ------------------ STARTUP & RUN ------------------
 if __name__ == "__main__":
+    if "--migrate-sqlite" in sys.argv:
+        migrate_json_to_sqlite()
+        sys.exit(0)
+    if "--bench-codecs" in sys.argv:
+        i = sys.argv.index("--bench-codecs")
+        bench_codecs(int(sys.argv[i + 1]) if len(sys.argv) > i + 1 else 100_000)
+        sys.exit(0)
+    if "--list-backups" in sys.argv:
+        list_backups()
+        sys.exit(0)
+    if "--restore" in sys.argv:
+        # python main.py --restore [latest | YYYYmmdd | YYYYmmdd_HHMMSS]
+        i = sys.argv.index("--restore")
+        restore_backup(sys.argv[i + 1] if len(sys.argv) > i + 1 else "latest")
+        sys.exit(0)
     try:
         safe_print("🚀 Starting mega bot with audit reconciliation...")
-        if not os.path.exists(DATA_FILE):
-            save_data(init_data_structure())
+        store.load()
+        attachments.load()
+        mark_phase("load")
         bot.run(TOKEN)
     except Exception as e:
         safe_print("❌ Fatal error while running bot:", e)
         traceback.print_exc()
+    finally:
+        ingest.drain()
+        store.close()
+        if attachments.dirty:
+            attachments.save_index(attachments.encode_index())
 # ------------------ STARTUP & RUN ------------------
 
 if name == "main": try: safe_print("🚀 Starting mega bot with audit reconciliation...") if not os.path.exists(DATA_FILE): save_data(init_data_structure()) bot.run(TOKEN) except Exception as e: safe_print("❌ Fatal error while running bot:", e)